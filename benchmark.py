@@ -0,0 +1,218 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import full_simulation
+import monte_carlo
+import scenario
+
+# Reproducible timings for the search engines. Every benchmark is a fixed
+# configuration; the results go to JSON and are compared against a stored baseline.
+# Only the deterministic fields fail the check: the counters (nodes, leaves) and the
+# checksum of the results must not change at all. Timings are too noisy for that, so
+# a time relative to REFERENCE_BENCHMARK (so a baseline stored on another machine
+# still applies) that grew by more than --tolerance is only reported as a warning.
+
+BASELINE_FILE = "benchmark_baseline.json"
+# the benchmark the others are timed against; it is always run
+REFERENCE_BENCHMARK = "single_grid"
+SEED = 0
+MIN_ROUND_TIME = 0.05
+
+# reduced grids: every 8th speed of the ranges used by the two sweep scripts, and a
+# 16x16 block of them for sweep(), which only takes contiguous ranges
+SINGLE_GRID = (range(109, 196, 8), range(180, 267, 8))
+DOUBLE_GRID = (range(109, 206, 8), range(180, 277, 8))
+SWEEP_BLOCK = (range(170, 186), range(185, 201))
+MONTE_CARLO_TRIALS_PER_CELL = 64
+# trials per run of the benchmarks that also report trials_per_second
+TRIALS = {"monte_carlo": MONTE_CARLO_TRIALS_PER_CELL * len(SWEEP_BLOCK[0]) * len(SWEEP_BLOCK[1])}
+
+
+def load_double_ultimate():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "push_2_limit", "full_simulation_2_ultimate.py")
+    spec = importlib.util.spec_from_file_location("full_simulation_2_ultimate", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# every run returns (search stats or None, checksum), the checksum being the total of
+# the turns it computed
+
+
+def bench_cell(model, runner_speed, puller_speed, prune=False):
+    def run():
+        stats = model.SearchStats()
+        result = model.cal_speed_turns(runner_speed, puller_speed, prune=prune, stats=stats)
+        return stats, result["Num of Run"]
+    return run
+
+
+def bench_grid(model, grid):
+    puller_speeds, runner_speeds = grid
+
+    def run():
+        stats = model.SearchStats()
+        checksum = 0
+        for p_speed in puller_speeds:
+            for r_speed in runner_speeds:
+                checksum += model.cal_speed_turns(r_speed, p_speed, stats=stats)["Num of Run"]
+        return stats, checksum
+    return run
+
+
+def bench_sweep(model, grid):
+    puller_speeds, runner_speeds = grid
+
+    def run():
+        # the production path: memoized max_turns, serial and without cache
+        table = model.sweep(puller_speeds.start, puller_speeds.stop - 1, runner_speeds.start, runner_speeds.stop - 1)
+        return None, int(table.sum())
+    return run
+
+
+def bench_kernel(kernel, grid):
+    puller_speeds, runner_speeds = grid
+
+    def run():
+        # compiled scenario kernel over the same block as bench_sweep
+        table = scenario.round_table(kernel, puller_speeds, runner_speeds)
+        return None, sum(map(sum, table))
+    return run
+
+
+def bench_monte_carlo(grid, trials_per_cell):
+    puller_speeds, runner_speeds = grid
+
+    def run():
+        counts = monte_carlo.monte_carlo_counts(puller_speeds, runner_speeds, trials_per_cell, seed=SEED,
+                                                runner_deducs=(0.16, 0.22, 0.24), puller_deducs=(0.16 + 0.25, 0.47))
+        # turns summed over every trial of the histogram
+        return None, int((counts * np.arange(counts.shape[-1])).sum())
+    return run
+
+
+def benchmarks():
+    double = load_double_ultimate()
+    return {
+        "single_cell_193_186": bench_cell(full_simulation, 193, 186),
+        "single_cell_193_186_prune": bench_cell(full_simulation, 193, 186, prune=True),
+        "double_cell_181_200": bench_cell(double, 181, 200),
+        "double_cell_181_200_prune": bench_cell(double, 181, 200, prune=True),
+        "single_grid": bench_grid(full_simulation, SINGLE_GRID),
+        "double_grid": bench_grid(double, DOUBLE_GRID),
+        "single_sweep": bench_sweep(full_simulation, SWEEP_BLOCK),
+        "double_sweep": bench_sweep(double, SWEEP_BLOCK),
+        "single_kernel": bench_kernel(scenario.compile_scenario(scenario.SCENARIOS["single"]), SWEEP_BLOCK),
+        "double_kernel": bench_kernel(scenario.compile_scenario(scenario.SCENARIOS["double"]), SWEEP_BLOCK),
+        "monte_carlo": bench_monte_carlo(SWEEP_BLOCK, MONTE_CARLO_TRIALS_PER_CELL),
+    }
+
+
+def measure(run, repeat):
+    # best of `repeat` untraced rounds for the time, then one traced run for the memory;
+    # quick benchmarks are looped until a round lasts MIN_ROUND_TIME, like timeit does
+    random.seed(SEED)
+    np.random.seed(SEED)
+    start = time.perf_counter()
+    stats, checksum = run()
+    inner = max(1, int(MIN_ROUND_TIME / max(time.perf_counter() - start, 1e-9)))
+
+    wall_time = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(inner):
+            run()
+        wall_time = min(wall_time, (time.perf_counter() - start) / inner)
+
+    tracemalloc.start()
+    run()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"wall_time": wall_time,
+            "nodes": None if stats is None else stats.nodes,
+            "leaves": None if stats is None else stats.leaves,
+            "checksum": checksum,
+            "peak_memory": peak_memory}
+
+
+def compare(results, baseline, tolerance):
+    # (regressions, timing warnings)
+    regressions = []
+    warnings = []
+    for name, result in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        if result["relative_time"] > base["relative_time"] * (1 + tolerance):
+            warnings.append(f"{name}: relative_time {result['relative_time']:.4f} "
+                            f"vs baseline {base['relative_time']:.4f}")
+        for key in ("nodes", "leaves", "checksum"):
+            if result[key] != base[key]:
+                regressions.append(f"{name}: {key} {result[key]} vs baseline {base[key]}")
+    return regressions, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", nargs="*", help="benchmark names to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results JSON here instead of stdout")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help=f"allowed growth of the time relative to {REFERENCE_BENCHMARK} before it is "
+                             "reported (timings only warn)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    results = {"python": platform.python_version(),
+               "machine": platform.machine(),
+               "seed": SEED,
+               "benchmarks": {}}
+    for name, run in benchmarks().items():
+        if args.only and name not in args.only and name != REFERENCE_BENCHMARK:
+            continue
+        results["benchmarks"][name] = measure(run, args.repeat)
+        if name in TRIALS:
+            results["benchmarks"][name]["trials_per_second"] = TRIALS[name] / results["benchmarks"][name]["wall_time"]
+    reference_time = results["benchmarks"][REFERENCE_BENCHMARK]["wall_time"]
+    for result in results["benchmarks"].values():
+        result["relative_time"] = result["wall_time"] / reference_time
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(text + "\n")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions, warnings = compare(results, baseline, args.tolerance)
+        for line in warnings:
+            print("WARNING " + line, file=sys.stderr)
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import argparse
+
+import numpy as np
+
+from simulation_common import Action, trace_action
+from scenario import SCENARIOS
+
+# Level-synchronous search: instead of recursing depth first over Runner/Puller
+# records, the whole frontier (every state reached after the same number of actions)
+# is one NumPy structured array, and one action of every row is computed with a few
+# array operations per ultimate combination. States that are equal apart from their
+# run count are merged with np.unique, keeping the row with the most runs. Every level
+# is kept, so the action series of the winner is rebuilt from the parent indices.
+
+FRONTIER_DTYPE = np.dtype([
+    ("time", np.float64),
+    ("runner_left", np.float64),
+    ("puller_left", np.float64),
+    ("runner_speed", np.float64),
+    ("speed_up", np.bool_),
+    ("ultimates", np.uint8),       # bit k set: ultimate k still available
+    ("used", np.uint8),            # ultimates used right before this row's action
+    ("runner_acted", np.bool_),    # the action that led to this row
+    ("runs", np.int64),
+    ("parent", np.int64),          # row in the previous level
+])
+
+# the fields that make up a state for the merge
+STATE_FIELDS = ["time", "runner_left", "puller_left", "runner_speed", "speed_up", "ultimates"]
+
+
+def cal_runner_time(scenario, cur_time, speed, left_distance):
+    # array version of simulation_common.cal_runner_time, same float operations
+    hst = scenario.high_speed_time
+    slow = speed - scenario.high_speed_loss
+    runner_time_tmp = left_distance / speed
+    crossed = (left_distance - speed * (hst - cur_time)) / slow + hst - cur_time
+    return np.where(cur_time >= hst, left_distance / slow,
+                    np.where(runner_time_tmp + cur_time > hst, crossed, runner_time_tmp))
+
+
+def expand(scenario, frontier, puller_speed):
+    # children of every frontier row, one block per ultimate combination; rows whose
+    # next action falls past total_time are leaves and have no child
+    s = scenario
+    ad = s.action_distance
+    children = []
+    for used in range(1 << len(s.ultimates)):
+        rows = np.flatnonzero(frontier["ultimates"] & used == used)
+        if len(rows) == 0:
+            continue
+        parent = frontier[rows]
+        runner_left = parent["runner_left"]
+        puller_left = parent["puller_left"]
+        wins_ties = False
+        for k, ult in enumerate(s.ultimates):
+            if used >> k & 1:
+                runner_left = np.maximum(0, runner_left - ult.runner_advance * ad)
+                puller_left = np.maximum(0, puller_left - ult.puller_advance * ad)
+                wins_ties = wins_ties or ult.puller_wins_ties
+
+        runner_time = cal_runner_time(s, parent["time"], parent["runner_speed"], runner_left)
+        puller_time = puller_left / puller_speed
+        # explicit tie-break (puller first only if an ultimate that wins ties was used)
+        runner_acts = runner_time < puller_time if wins_ties else runner_time <= puller_time
+        next_time = parent["time"] + np.where(runner_acts, runner_time, puller_time)
+        alive = next_time <= s.total_time
+
+        child = np.empty(int(alive.sum()), dtype=FRONTIER_DTYPE)
+        runner_acts = runner_acts[alive]
+        runner_speed = parent["runner_speed"][alive]
+        speed_up = parent["speed_up"][alive]
+        child["time"] = next_time[alive]
+        child["runner_left"] = np.where(runner_acts, ad, 0)
+        child["puller_left"] = np.where(runner_acts, puller_left[alive] - runner_time[alive] * puller_speed, ad)
+        # the pull buff lasts until the runner's next run
+        child["runner_speed"] = np.where(runner_acts,
+                                         np.where(speed_up, runner_speed - s.pull_speed_up, runner_speed),
+                                         runner_speed + s.pull_speed_up)
+        child["speed_up"] = ~runner_acts & (s.pull_speed_up != 0)
+        child["ultimates"] = parent["ultimates"][alive] & ~np.uint8(used)
+        child["used"] = used
+        child["runner_acted"] = runner_acts
+        child["runs"] = parent["runs"][alive] + runner_acts
+        child["parent"] = rows[alive]
+        children.append(child)
+    return np.concatenate(children)
+
+
+def merge(frontier):
+    # one row per state, the one with the most runs (np.unique keeps the first occurrence)
+    order = np.argsort(-frontier["runs"], kind="stable")
+    frontier = frontier[order]
+    keys = np.empty(len(frontier), dtype=[(name, FRONTIER_DTYPE[name]) for name in STATE_FIELDS])
+    for name in STATE_FIELDS:
+        keys[name] = frontier[name]
+    _, first = np.unique(keys, return_index=True)
+    return frontier[np.sort(first)]
+
+
+def rebuild_actions(scenario, levels, level, row):
+    # the action series of levels[level][row], back to the root through the parents
+    steps = []
+    while level > 0:
+        node = levels[level][row]
+        steps.append(node)
+        row = node["parent"]
+        level -= 1
+    last_action = None
+    for node in reversed(steps):
+        start_time = levels[0][0]["time"] if last_action is None else last_action.time
+        for k in range(len(scenario.ultimates)):
+            if node["used"] >> k & 1:
+                name = "puller Ultimate" if k == 0 else f"puller Ultimate {k + 1}"
+                last_action = Action(name, time=start_time, par_action=last_action)
+        name = "runner run" if node["runner_acted"] else "puller pull"
+        last_action = Action(name, time=float(node["time"]), par_action=last_action)
+    return trace_action(last_action) if last_action is not None else []
+
+
+def frontier_turns(runner_speed, puller_speed, scenario=SCENARIOS["single"], dedup=True):
+    # returns the best result in cal_speed_turns' format, plus the rows expanded
+    s = scenario
+    root = np.zeros(1, dtype=FRONTIER_DTYPE)
+    root["runner_left"] = s.action_distance
+    root["puller_left"] = s.action_distance
+    root["runner_speed"] = runner_speed
+    root["ultimates"] = (1 << len(s.ultimates)) - 1
+    root["parent"] = -1
+
+    levels = [root]
+    nodes = 0
+    while len(levels[-1]):
+        nodes += len(levels[-1])
+        frontier = expand(s, levels[-1], puller_speed)
+        if dedup and len(frontier):
+            frontier = merge(frontier)
+        levels.append(frontier)
+
+    # every node has a leaf below it with the same runs, so the best node is the answer
+    best_level, best_row, best_runs = 0, 0, 0
+    for level, frontier in enumerate(levels):
+        if len(frontier) and frontier["runs"].max() > best_runs:
+            best_level, best_row = level, int(np.argmax(frontier["runs"]))
+            best_runs = int(frontier["runs"][best_row])
+    return {"Action Series": rebuild_actions(s, levels, best_level, best_row),
+            "Num of Run": best_runs,
+            "Nodes": nodes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="single")
+    parser.add_argument("--runner-speed", type=float, default=193)
+    parser.add_argument("--puller-speed", type=float, default=186)
+    parser.add_argument("--no-dedup", action="store_true", help="expand the full tree, without merging states")
+    args = parser.parse_args()
+
+    r = frontier_turns(args.runner_speed, args.puller_speed, SCENARIOS[args.scenario], dedup=not args.no_dedup)
+    print(f"Num of Runner run: {r['Num of Run']} ({r['Nodes']} nodes)")
+    print("Action Series: " + "".join(str(a) for a in r["Action Series"]))
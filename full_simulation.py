@@ -1,12 +1,26 @@
-from typing import List, Tuple, Literal
+from typing import List, Tuple, Literal, NamedTuple
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize
-import pandas as pd
-from copy import deepcopy
+import heapq
+import math
+import time
+import bisect
+import os
+import argparse
+import json
+from multiprocessing import Pool, shared_memory
+
+# helpers shared with push_2_limit/full_simulation_2_ultimate.py; the trace and file
+# helpers are also imported from here by the scripts that use them
+from simulation_common import (CACHE_FILE, MAX_QUERY_SPEED, MIN_PULLER_SPEED, MIN_RUNNER_SPEED, Action,
+                               TurnsCache, add_leaf, bisect_min_speed, cal_runner_distance, cal_runner_time,
+                               load_traces, scan_min_speed, sweep_rows, trace_action, trace_series,
+                               write_leaves_npz, write_profile, write_results_npz, write_results_to_file)
+from scenario import Scenario, Ultimate, scenario_hash as hash_scenario
 
 # Now simulate the full process 
 TOTAL_TIME = 150
+# every cycle after the first one adds this much action value
+CYCLE_TIME = 100
 
 # runner highspeed time 
 HIGH_SPEED_TIME = 142.857
@@ -16,80 +30,240 @@ RUNNER_DEDUC = 0.24 # 0.16 # 0.22
 PULLER_DEDUC = 0.24 # 0.16 + 0.25 # 0.47
 
 PULLER_NORMAL_ATTACK_DEDUC = 0.3
+# let the puller choose a normal attack instead of the skill (no pull, its next action
+# comes PULLER_NORMAL_ATTACK_DEDUC sooner), for skill point starved rotations; --normal-attack
+PULLER_NORMAL_ATTACK = False
+
+# distance slack that keeps the branch and bound estimate above float noise
+BOUND_SLACK = 1e-6
+
+
+# immutable state records: a branch derives its own state with _replace instead of
+# deepcopy-ing the parent's, and untouched states are shared between branches
+class Runner(NamedTuple):
+    speed: float
+    left_distance: float
+    action_time: int
+
+class Puller(NamedTuple):
+    speed: float
+    left_distance: float
+    has_ultimate: bool
+
+
+def set_normal_attack(enabled):
+    # also the initializer of the sweep workers, which need not inherit a flag set from
+    # the command line
+    global PULLER_NORMAL_ATTACK
+    PULLER_NORMAL_ATTACK = enabled
 
+def dominated(front, cur_time, runner, puller):
+    # state dedup: a state seen before with the same time, gauges and ultimate has the
+    # same future, so if it also had at least as many runs this one can be dropped.
+    # Only identical states are compared: with normal attacks a runner or puller that is
+    # closer to acting does not always end with as many runs (e.g. double ultimate
+    # runner 260 / puller 141). Otherwise the state's runs are kept in front
+    key = (cur_time, runner.left_distance, puller.left_distance, puller.has_ultimate)
+    seen = front.get(key)
+    if seen is not None and seen >= runner.action_time:
+        return True
+    front[key] = runner.action_time
+    return False
 
-class Action():
-    def __init__(self, action_name, time, par_action):
-        self.action_name = action_name
-        self.time = time
-        self.par_action = par_action
+# per-cell counters written by --profile, in this order
+PROFILE_FIELDS = ("nodes", "leaves", "pruned", "branches_no_ult", "branches_ult", "max_depth",
+                  "runner_time_seconds", "copy_seconds")
+
+class SearchStats():
+    # filled in by the search when passed in; with timing=True the time spent computing
+    # runner times and building child states is measured too. Without stats the search
+    # only pays for the `is not None` checks
+    def __init__(self, timing=False):
+        self.nodes = 0
+        self.leaves = 0
+        self.pruned = 0
+        self.branches_no_ult = 0
+        self.branches_ult = 0
+        self.max_depth = 0
+        self.timing = timing
+        self.runner_time_seconds = 0.0
+        self.copy_seconds = 0.0
 
     def __str__(self):
-        return f"({self.action_name}, time: {self.time:.2f})"
+        return f"(nodes: {self.nodes}, leaves: {self.leaves}, pruned: {self.pruned})"
+
+    def as_row(self):
+        return [getattr(self, field) for field in PROFILE_FIELDS]
 
-class Character():
-    def __init__(self, speed, left_distance):
-        self.speed = speed
-        self.left_distance = left_distance
+def upper_bound_runs(cur_time, runner_speed, runner_left, puller_speed, puller_left, has_ultimate):
+    # admissible bound on the runner runs still possible before TOTAL_TIME: the ultimate
+    # is applied in full, the runner keeps its pre-HIGH_SPEED_TIME speed, and each
+    # possible pull saves a whole ACTION_DISTANCE. Takes the fields rather than the
+    # states, so the chains of run_out_leaf and max_runs do not build states for it
+    remaining = TOTAL_TIME - cur_time
+    puller_deduc = PULLER_DEDUC * ACTION_DISTANCE if has_ultimate else 0
+    runner_deduc = RUNNER_DEDUC * ACTION_DISTANCE if has_ultimate else 0
 
-class Runner(Character):
-    def __init__(self, speed, left_distance, action_time):
-        super().__init__(speed, left_distance)
-        self.action_time = action_time
+    puller_covered = puller_speed * remaining + puller_deduc + BOUND_SLACK
+    if puller_covered < puller_left:
+        num_pull = 0
+    else:
+        num_pull = math.floor((puller_covered - puller_left) / ACTION_DISTANCE) + 1
 
-class Puller(Character):
-    def __init__(self, speed, left_distance, has_ultimate):
-        super().__init__(speed, left_distance)
-        self.has_ultimate = has_ultimate
+    runner_covered = runner_speed * remaining + runner_deduc + num_pull * ACTION_DISTANCE + BOUND_SLACK
+    if runner_covered < runner_left:
+        return 0
+    return math.floor((runner_covered - runner_left) / ACTION_DISTANCE) + 1
+
+def run_out_leaf(cur_time, runner, puller, last_action, Results=None, stats=None, depth=0):
+    # once the ultimate is used the rest of the timeline is a single chain, so it is played
+    # out in a loop instead of one generator per action: same float operations, same
+    # counters and the same bound check at every node. Returns the leaf, or None if the
+    # bound drops the chain on the way.
+    # The loop still takes the runner's runs one at a time: between two pulls there are at
+    # most 3 of them in the sweep range, and counting them in closed form would not add
+    # the times up with the same floats, which decide the exact-tie cells
+    runner_speed, runner_left, action_time = runner
+    puller_speed, puller_left = puller.speed, puller.left_distance
+    timed = stats is not None and stats.timing
+    while True:
+        if stats is not None:
+            stats.branches_no_ult += 1
+            if timed:
+                start = time.perf_counter()
+        runner_time = cal_runner_time(cur_time, runner_speed, runner_left, HIGH_SPEED_TIME)
+        if timed:
+            stats.runner_time_seconds += time.perf_counter() - start
+        puller_time = puller_left / puller_speed
+        if runner_time <= puller_time:
+            next_time = cur_time + runner_time
+            if next_time > TOTAL_TIME:
+                return action_time, last_action
+            last_action = Action("runner run", time=next_time, par_action=last_action)
+            runner_left = ACTION_DISTANCE
+            action_time += 1
+            puller_left = puller_left - runner_time * puller_speed
+        else:
+            next_time = cur_time + puller_time
+            if next_time > TOTAL_TIME:
+                return action_time, last_action
+            last_action = Action("puller pull", time=next_time, par_action=last_action)
+            runner_left = 0
+            puller_left = ACTION_DISTANCE
+        cur_time = next_time
+        depth += 1
+        if stats is not None:
+            stats.nodes += 1
+            stats.max_depth = max(stats.max_depth, depth)
+        if Results:
+            bound = upper_bound_runs(cur_time, runner_speed, runner_left, puller_speed, puller_left, False)
+            if action_time + bound <= Results[-1]["Num of Run"]:
+                if stats is not None:
+                    stats.pruned += 1
+                return None
 
+def run_out(cur_time, runner_speed, runner_left, puller_speed, puller_left, stats=None):
+    # run_out_leaf for max_runs: only the run count, and the chain counts as one node
+    runs = 0
+    timed = stats is not None and stats.timing
+    while True:
+        if timed:
+            start = time.perf_counter()
+        runner_time = cal_runner_time(cur_time, runner_speed, runner_left, HIGH_SPEED_TIME)
+        if timed:
+            stats.runner_time_seconds += time.perf_counter() - start
+        puller_time = puller_left / puller_speed
+        if runner_time <= puller_time:
+            next_time = cur_time + runner_time
+            if next_time > TOTAL_TIME:
+                break
+            runner_left = ACTION_DISTANCE
+            runs += 1
+            puller_left = puller_left - runner_time * puller_speed
+        else:
+            next_time = cur_time + puller_time
+            if next_time > TOTAL_TIME:
+                break
+            runner_left = 0
+            puller_left = ACTION_DISTANCE
+        cur_time = next_time
+    if stats is not None:
+        stats.leaves += 1
+    return runs
 
-def trace_action(action):
-    path = [action]
-    while action.par_action is not None:
-        action = action.par_action
-        path.append(action)
-    
-    return list(reversed(path))
+def iter_leaves(cur_time, runner, puller, last_action, Results=None, stats=None, depth=0, front=None):
+    # yields (Num of Run, last action) for every leaf, depth first; only the current path
+    # is alive, the action series is rebuilt from the par_action chain when needed.
+    # With a front (a dict, see dominated) repeated states are dropped
+    timed = False
+    if stats is not None:
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, depth)
+        timed = stats.timing
+    # when the caller passes its incumbent list, drop the subtree if even the ideal
+    # timeline cannot beat Results[-1]
+    if Results:
+        if runner.action_time + upper_bound_runs(cur_time, runner.speed, runner.left_distance, puller.speed,
+                                                 puller.left_distance, puller.has_ultimate) \
+                <= Results[-1]["Num of Run"]:
+            if stats is not None:
+                stats.pruned += 1
+            return
+    if front is not None and dominated(front, cur_time, runner, puller):
+        if stats is not None:
+            stats.pruned += 1
+        return
+    # no ultimate left: no choice left either (unless the puller may normal attack),
+    # only the chain to the leaf
+    if not puller.has_ultimate and not PULLER_NORMAL_ATTACK:
+        leaf = run_out_leaf(cur_time, runner, puller, last_action, Results, stats, depth)
+        if leaf is not None:
+            yield leaf
+        return
 
-def simulate(cur_time, runner, puller, last_action, Results):
     # Try both: no-ult first, then ult (if available)
     for use_ultimate in (0, 1):
-        br_runner = deepcopy(runner)
-        br_puller = deepcopy(puller)
+        br_runner = runner
+        br_puller = puller
         br_last_action = last_action
 
         if use_ultimate:
             if not br_puller.has_ultimate:
                 continue  # can't use it
             # apply ultimate as an action at current time
+            if timed:
+                start = time.perf_counter()
             br_last_action = Action("puller Ultimate", time=cur_time, par_action=br_last_action)
-            br_runner.left_distance = max(0, br_runner.left_distance - RUNNER_DEDUC * ACTION_DISTANCE)
-            br_puller.left_distance = max(0, br_puller.left_distance - PULLER_DEDUC * ACTION_DISTANCE)
-            br_puller.has_ultimate = False
+            br_runner = br_runner._replace(
+                left_distance=max(0, br_runner.left_distance - RUNNER_DEDUC * ACTION_DISTANCE))
+            br_puller = br_puller._replace(
+                left_distance=max(0, br_puller.left_distance - PULLER_DEDUC * ACTION_DISTANCE),
+                has_ultimate=False)
+            if timed:
+                stats.copy_seconds += time.perf_counter() - start
         
-        # start from here
-        # change the runner time if time passed the HIGH_SPEED_TIME
-        if cur_time >= HIGH_SPEED_TIME:
-            runner_time = br_runner.left_distance / (br_runner.speed - 60)
-        else:
-            runner_time_tmp = br_runner.left_distance / br_runner.speed
-            if runner_time_tmp + cur_time > HIGH_SPEED_TIME:
-                dis_after_high_speed = br_runner.left_distance - br_runner.speed * (HIGH_SPEED_TIME - cur_time)
-
-                runner_time = dis_after_high_speed / (br_runner.speed - 60) + HIGH_SPEED_TIME - cur_time
+        if stats is not None:
+            if use_ultimate:
+                stats.branches_ult += 1
             else:
-                runner_time = runner_time_tmp
-
+                stats.branches_no_ult += 1
+            if timed:
+                start = time.perf_counter()
+        # start from here
+        runner_time = cal_runner_time(cur_time, br_runner.speed, br_runner.left_distance, HIGH_SPEED_TIME)
+        if timed:
+            stats.runner_time_seconds += time.perf_counter() - start
         puller_time = br_puller.left_distance / br_puller.speed
 
         # choose next event time; explicit tie-break (puller first only if used ultimate)
         if runner_time < puller_time or (runner_time == puller_time and not use_ultimate):
             next_time = cur_time + runner_time
             if next_time > TOTAL_TIME:
-                Results.append({"Action Series": trace_action(br_last_action),
-                                "Num of Run": br_runner.action_time})
+                yield br_runner.action_time, br_last_action
                 continue
             # runner acts
+            if timed:
+                start = time.perf_counter()
             new_action = Action("runner run", time=next_time, par_action=br_last_action)
             new_runner = Runner(speed=br_runner.speed,
                                 left_distance=ACTION_DISTANCE,
@@ -97,42 +271,61 @@ def simulate(cur_time, runner, puller, last_action, Results):
             new_puller = Puller(speed=br_puller.speed,
                                 left_distance=br_puller.left_distance - runner_time * br_puller.speed,
                                 has_ultimate=br_puller.has_ultimate)
-            simulate(next_time, new_runner, new_puller, new_action, Results)
+            if timed:
+                stats.copy_seconds += time.perf_counter() - start
+            yield from iter_leaves(next_time, new_runner, new_puller, new_action, Results, stats, depth + 1, front)
         else:
             next_time = cur_time + puller_time
             if next_time > TOTAL_TIME:
-                Results.append({"Action Series": trace_action(br_last_action),
-                                "Num of Run": br_runner.action_time})
+                yield br_runner.action_time, br_last_action
                 continue
             # puller acts: branch on skill vs normal attack (no mutation of branch roots)
             # if we just want to test the highest runner rounds, then we always pull for simplicity
-            # for use_skill in (1, 0):
-            # if use_skill:
-            new_action = Action("puller pull", time=next_time, par_action=br_last_action)
-            new_puller = Puller(speed=br_puller.speed,
-                                left_distance=ACTION_DISTANCE,
-                                has_ultimate=br_puller.has_ultimate)
-            new_runner = Runner(speed=br_runner.speed,
-                                left_distance=0,
-                                action_time=br_runner.action_time)
-                # else:
-                #     new_action = Action("puller normal attack", time=next_time, par_action=br_last_action)
-                #     new_puller = Puller(speed=br_puller.speed,
-                #                         left_distance=ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC),
-                #                         has_ultimate=br_puller.has_ultimate)
-                #     new_runner = Runner(speed=br_runner.speed,
-                #                         left_distance=br_runner.left_distance - puller_time * br_runner.speed,
-                #                         action_time=br_runner.action_time)
-            simulate(next_time, new_runner, new_puller, new_action, Results)
+            for use_skill in ((1, 0) if PULLER_NORMAL_ATTACK else (1,)):
+                if timed:
+                    start = time.perf_counter()
+                if use_skill:
+                    new_action = Action("puller pull", time=next_time, par_action=br_last_action)
+                    new_puller = Puller(speed=br_puller.speed,
+                                        left_distance=ACTION_DISTANCE,
+                                        has_ultimate=br_puller.has_ultimate)
+                    new_runner = Runner(speed=br_runner.speed,
+                                        left_distance=0,
+                                        action_time=br_runner.action_time)
+                else:
+                    new_action = Action("puller normal attack", time=next_time, par_action=br_last_action)
+                    new_puller = Puller(speed=br_puller.speed,
+                                        left_distance=ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC),
+                                        has_ultimate=br_puller.has_ultimate)
+                    new_runner = Runner(speed=br_runner.speed,
+                                        left_distance=max(0, br_runner.left_distance - cal_runner_distance(
+                                            cur_time, br_runner.speed, puller_time, HIGH_SPEED_TIME)),
+                                        action_time=br_runner.action_time)
+                if timed:
+                    stats.copy_seconds += time.perf_counter() - start
+                yield from iter_leaves(next_time, new_runner, new_puller, new_action, Results, stats, depth + 1,
+                                       front)
+
+
+def simulate(cur_time, runner, puller, last_action, Results, prune=False, stats=None, dominance=False):
+    # branch and bound: Results only holds improving leaves in this mode, so the last one
+    # is the incumbent that iter_leaves prunes against. dominance drops repeated states,
+    # which keeps the search small with PULLER_NORMAL_ATTACK; like prune it only keeps
+    # the best leaves intact
+    for action_time, leaf_action in iter_leaves(cur_time, runner, puller, last_action,
+                                                Results if prune else None, stats,
+                                                front={} if dominance else None):
+        add_leaf(Results, leaf_action, action_time, prune, stats)
     return Results
 
 
-def cal_speed_turns(runner_speed, puller_speed):
+def cal_speed_turns(runner_speed, puller_speed, prune=False, stats=None, dominance=False):
     bronya = Puller(puller_speed, ACTION_DISTANCE, has_ultimate=True)
     firefly = Runner(runner_speed, ACTION_DISTANCE, action_time=0)
 
     Results = []
-    Results = simulate(cur_time=0, runner=firefly, puller=bronya, last_action=None, Results=Results)
+    Results = simulate(cur_time=0, runner=firefly, puller=bronya, last_action=None, Results=Results,
+                       prune=prune, stats=stats, dominance=dominance)
 
     max_Result = Results[0]
     for i in range(1, len(Results)):
@@ -141,37 +334,540 @@ def cal_speed_turns(runner_speed, puller_speed):
             max_Result = r
     return max_Result
 
-def write_results_to_file(Results, filename="results.txt"):
-    with open(filename, 'w') as f:
-        for r in Results:
-            f.write("======= \n")
-            f.write(f"Num of Runner run: {r['Num of Run']}\n")
-            f.write("Action Series: ")
-            for a in r['Action Series']:
-                f.write(str(a))
-            f.write("\n")  # Add newline after each result
-
-min_puller_speed = 99 + 10
-max_puller_speed = 185 + 10
-
-min_runner_speed = 169 + 11
-max_runner_speed = 255 + 11
-
-round_table = np.zeros((max_puller_speed - min_puller_speed + 1, max_runner_speed - min_runner_speed + 1))
-
-for p_speed in range(min_puller_speed, max_puller_speed + 1):
-    for r_speed in range(min_runner_speed, max_runner_speed + 1):
-        max_Result = cal_speed_turns(runner_speed=r_speed, puller_speed=p_speed)
-        t = max_Result['Num of Run']
-        round_table[p_speed - min_puller_speed][r_speed - min_runner_speed] = t
-# write_results_to_file(Results, "my_results.txt")
-
-runner_speeds = np.arange(min_runner_speed, max_runner_speed + 1)
-puller_speeds = np.arange(min_puller_speed, max_puller_speed + 1)
-df = pd.DataFrame(round_table, index=puller_speeds, columns=runner_speeds)
-df.index.name = 'Puller_speed'
-df.columns.name = 'Runner_speed'
-
-csv_filename = "round_table_with_full_time_other.csv"
-df.to_csv(csv_filename)
-print(f"Round table saved to {csv_filename}")
\ No newline at end of file
+def normalize_state(cur_time, runner_left, puller_left, has_ultimate):
+    # action_time and the speeds are left out: the turns still reachable only depend on
+    # where the timeline is, so transposed paths share one memo entry. Floats are kept
+    # exact, rounding them changes the outcome of exact runner/puller ties
+    return (cur_time, runner_left, puller_left, has_ultimate)
+
+def max_runs(cur_time, runner_speed, runner_left, puller_speed, puller_left, has_ultimate, memo,
+             stats=None, depth=0):
+    # same transitions as simulate, but returns the max number of runner runs
+    # still reachable from this state instead of enumerating every leaf
+    key = normalize_state(cur_time, runner_left, puller_left, has_ultimate)
+    if key in memo:
+        return memo[key]
+    # nodes counts the expanded (not memoized) states
+    timed = False
+    if stats is not None:
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, depth)
+        timed = stats.timing
+    if not has_ultimate and not PULLER_NORMAL_ATTACK:
+        best = run_out(cur_time, runner_speed, runner_left, puller_speed, puller_left, stats)
+        memo[key] = best
+        return best
+
+    best = 0
+    for use_ultimate in (0, 1):
+        br_runner_left = runner_left
+        br_puller_left = puller_left
+        br_has_ultimate = has_ultimate
+
+        if use_ultimate:
+            if not br_has_ultimate:
+                continue
+            br_runner_left = max(0, br_runner_left - RUNNER_DEDUC * ACTION_DISTANCE)
+            br_puller_left = max(0, br_puller_left - PULLER_DEDUC * ACTION_DISTANCE)
+            br_has_ultimate = False
+            # the ultimate is only tried where it can change the outcome: when even the
+            # ideal timeline after it cannot beat the runs found without it, this node's
+            # value is already known (and the memo stays exact)
+            if upper_bound_runs(cur_time, runner_speed, br_runner_left, puller_speed, br_puller_left,
+                                False) <= best:
+                if stats is not None:
+                    stats.pruned += 1
+                continue
+
+        if stats is not None:
+            if use_ultimate:
+                stats.branches_ult += 1
+            else:
+                stats.branches_no_ult += 1
+            if timed:
+                start = time.perf_counter()
+        runner_time = cal_runner_time(cur_time, runner_speed, br_runner_left, HIGH_SPEED_TIME)
+        if timed:
+            stats.runner_time_seconds += time.perf_counter() - start
+        puller_time = br_puller_left / puller_speed
+
+        if runner_time < puller_time or (runner_time == puller_time and not use_ultimate):
+            next_time = cur_time + runner_time
+            if next_time > TOTAL_TIME:
+                if stats is not None:
+                    stats.leaves += 1
+                continue
+            runs = 1 + max_runs(next_time, runner_speed, ACTION_DISTANCE,
+                                puller_speed, br_puller_left - runner_time * puller_speed,
+                                br_has_ultimate, memo, stats, depth + 1)
+        else:
+            next_time = cur_time + puller_time
+            if next_time > TOTAL_TIME:
+                if stats is not None:
+                    stats.leaves += 1
+                continue
+            runs = max_runs(next_time, runner_speed, 0,
+                            puller_speed, ACTION_DISTANCE,
+                            br_has_ultimate, memo, stats, depth + 1)
+            if PULLER_NORMAL_ATTACK:
+                runs = max(runs, max_runs(next_time, runner_speed,
+                                          max(0, br_runner_left - cal_runner_distance(cur_time, runner_speed,
+                                                                                      puller_time, HIGH_SPEED_TIME)),
+                                          puller_speed, ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC),
+                                          br_has_ultimate, memo, stats, depth + 1))
+        best = max(best, runs)
+
+    memo[key] = best
+    return best
+
+def max_turns(runner_speed, puller_speed, stats=None):
+    # equals cal_speed_turns(runner_speed, puller_speed)["Num of Run"]
+    memo = {}
+    return max_runs(0, runner_speed, ACTION_DISTANCE, puller_speed, ACTION_DISTANCE, True, memo, stats)
+
+def min_runner_speed(target_turns, puller_speed, tolerance=1e-3,
+                     low=MIN_RUNNER_SPEED, high=MAX_QUERY_SPEED):
+    # Firefly speed needed for target_turns with Bronya at puller_speed
+    return bisect_min_speed(lambda speed: max_turns(speed, puller_speed), target_turns, low, high, tolerance)
+
+def min_puller_speed(target_turns, runner_speed, tolerance=1e-3,
+                     low=MIN_PULLER_SPEED, high=MAX_QUERY_SPEED):
+    # Bronya speed needed for target_turns with Firefly at runner_speed; the turns go up
+    # and down with the puller speed, so this scans rather than bisects
+    return scan_min_speed(lambda speed: max_turns(runner_speed, speed), target_turns, low, high, tolerance)
+
+BREAKPOINTS_FILE = "round_table_breakpoints.npz"
+
+def runner_breakpoints(puller_speed, min_runner_speed, max_runner_speed):
+    # max turns at min_runner_speed, and the runner speeds in (min, max] where one more
+    # turn is reached, each the smallest float that reaches it (a speed that reaches two
+    # more turns at once appears twice)
+    base_turns = max_turns(min_runner_speed, puller_speed)
+    top_turns = max_turns(max_runner_speed, puller_speed)
+    thresholds = []
+    low = min_runner_speed
+    for target_turns in range(base_turns + 1, top_turns + 1):
+        low = bisect_min_speed(lambda speed: max_turns(speed, puller_speed), target_turns,
+                               low, max_runner_speed, tolerance=0)
+        thresholds.append(low)
+    return base_turns, thresholds
+
+class BreakpointTable():
+    # exact turn-count steps for fractional runner speeds, one row per puller speed:
+    # a lookup is a binary search in that row's thresholds. Like the monotone sweep it
+    # assumes turns never drop with runner speed, so isolated exact-tie cells (e.g.
+    # puller 184) are not represented
+    def __init__(self, puller_speeds, min_runner_speed, max_runner_speed, base_turns, thresholds):
+        self.puller_speeds = list(puller_speeds)
+        self.min_runner_speed = min_runner_speed
+        self.max_runner_speed = max_runner_speed
+        self.base_turns = list(base_turns)
+        self.thresholds = [list(row) for row in thresholds]
+        self.rows = {p_speed: i for i, p_speed in enumerate(self.puller_speeds)}
+
+    def lookup(self, runner_speed, puller_speed):
+        if puller_speed not in self.rows:
+            raise ValueError(f"puller speed {puller_speed} is not in the table")
+        if not self.min_runner_speed <= runner_speed <= self.max_runner_speed:
+            raise ValueError(f"runner speed {runner_speed} is outside "
+                             f"[{self.min_runner_speed}, {self.max_runner_speed}]")
+        i = self.rows[puller_speed]
+        return self.base_turns[i] + bisect.bisect_right(self.thresholds[i], runner_speed)
+
+    def save(self, filename=BREAKPOINTS_FILE):
+        # thresholds padded with inf into one 2d array
+        width = max([len(row) for row in self.thresholds] + [0])
+        thresholds = np.full((len(self.thresholds), width), np.inf)
+        for i, row in enumerate(self.thresholds):
+            thresholds[i, :len(row)] = row
+        np.savez(filename, scenario=scenario_hash(), puller_speeds=np.array(self.puller_speeds, dtype=np.float64),
+                 runner_range=np.array([self.min_runner_speed, self.max_runner_speed], dtype=np.float64),
+                 base_turns=np.array(self.base_turns), thresholds=thresholds)
+
+def build_breakpoint_table(puller_speeds, min_runner_speed, max_runner_speed):
+    rows = [runner_breakpoints(p_speed, min_runner_speed, max_runner_speed) for p_speed in puller_speeds]
+    return BreakpointTable(puller_speeds, min_runner_speed, max_runner_speed,
+                           [base for base, _ in rows], [thresholds for _, thresholds in rows])
+
+def load_breakpoint_table(filename=BREAKPOINTS_FILE):
+    with np.load(filename) as data:
+        if str(data["scenario"]) != scenario_hash():
+            raise ValueError(f"{filename} was built for other scenario constants")
+        min_runner_speed, max_runner_speed = data["runner_range"].tolist()
+        thresholds = [[t for t in row if np.isfinite(t)] for row in data["thresholds"].tolist()]
+        return BreakpointTable(data["puller_speeds"].tolist(), min_runner_speed, max_runner_speed,
+                               data["base_turns"].tolist(), thresholds)
+
+
+def sweep(min_puller_speed, max_puller_speed, min_runner_speed, max_runner_speed, workers=1, chunk_size=2,
+          cache=None, checkpoint=None, profile=None):
+    # profile, if given, is a (len(PROFILE_FIELDS), *round_table.shape) array that receives
+    # the SearchStats of every computed cell
+    shape = (max_puller_speed - min_puller_speed + 1, max_runner_speed - min_runner_speed + 1)
+    round_table = np.full(shape, np.nan)
+    if checkpoint is not None:
+        checkpoint.fill(round_table)
+    if cache is not None:
+        cache.fill(round_table, min_puller_speed, min_runner_speed)
+    missing = np.isnan(round_table)
+    if checkpoint is not None:
+        for i in np.nonzero(~missing.any(axis=1))[0]:
+            checkpoint.add_row(i, round_table[i])
+
+    if workers <= 1:
+        for p_speed in range(min_puller_speed, max_puller_speed + 1):
+            if not missing[p_speed - min_puller_speed].any():
+                continue
+            for r_speed in range(min_runner_speed, max_runner_speed + 1):
+                if not missing[p_speed - min_puller_speed][r_speed - min_runner_speed]:
+                    continue
+                stats = SearchStats(timing=True) if profile is not None else None
+                t = max_turns(runner_speed=r_speed, puller_speed=p_speed, stats=stats)
+                round_table[p_speed - min_puller_speed][r_speed - min_runner_speed] = t
+                if profile is not None:
+                    profile[:, p_speed - min_puller_speed, r_speed - min_runner_speed] = stats.as_row()
+            if checkpoint is not None:
+                checkpoint.add_row(p_speed - min_puller_speed, round_table[p_speed - min_puller_speed])
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=shape[0] * shape[1] * np.dtype(np.float64).itemsize)
+        try:
+            shared_table = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            shared_table[:] = round_table
+            # rows that are fully cached are not handed out at all
+            profile_fields = PROFILE_FIELDS if profile is not None else None
+            tasks = [(max_turns, SearchStats, profile_fields, shm.name, shape, start, min(start + chunk_size, shape[0]),
+                      min_puller_speed, min_runner_speed)
+                     for start in range(0, shape[0], chunk_size)
+                     if missing[start:start + chunk_size].any()]
+            with Pool(workers, initializer=set_normal_attack, initargs=(PULLER_NORMAL_ATTACK,)) as pool:
+                for start, stop, profile_rows in pool.imap_unordered(sweep_rows, tasks):
+                    if profile is not None:
+                        profile[:, start:stop] = profile_rows
+                    if checkpoint is not None:
+                        for i in range(start, stop):
+                            if missing[i].any():
+                                checkpoint.add_row(i, shared_table[i])
+            round_table = shared_table.copy()
+            del shared_table
+        finally:
+            shm.close()
+            shm.unlink()
+
+    if cache is not None:
+        cache.store(round_table, missing, min_puller_speed, min_runner_speed)
+    return round_table
+
+def model_scenario():
+    # this script's constants as a scenario.py Scenario (SCENARIOS["single"] as long as
+    # they are unchanged)
+    return Scenario("single ultimate", [Ultimate(RUNNER_DEDUC, PULLER_DEDUC)], total_time=TOTAL_TIME,
+                    high_speed_time=HIGH_SPEED_TIME, action_distance=ACTION_DISTANCE)
+
+def scenario_hash():
+    # every constant the turn count depends on; changing one of them starts a new
+    # set of cache entries instead of reusing stale ones. Same scheme as scenario.py, so
+    # grids of this script and of `hsr-sim sweep` carry the same hash for the same constants
+    return hash_scenario(model_scenario(), PULLER_NORMAL_ATTACK_DEDUC if PULLER_NORMAL_ATTACK else None)
+
+class SweepCheckpoint():
+    # completed rows of round_table are appended to <csv>.rows as soon as they are done and
+    # <csv>.manifest.json lists them, so an interrupted sweep can resume where it stopped
+    def __init__(self, csv_filename, min_puller_speed, max_puller_speed, min_runner_speed, max_runner_speed,
+                 resume=False):
+        self.rows_filename = csv_filename + ".rows"
+        self.manifest_filename = csv_filename + ".manifest.json"
+        self.min_puller_speed = min_puller_speed
+        self.width = max_runner_speed - min_runner_speed + 1
+        self.manifest = {"scenario": scenario_hash(),
+                         "grid": [min_puller_speed, max_puller_speed, min_runner_speed, max_runner_speed],
+                         "rows": []}
+        self.done = {}
+
+        if resume and os.path.exists(self.manifest_filename):
+            with open(self.manifest_filename) as f:
+                manifest = json.load(f)
+            if manifest["scenario"] == self.manifest["scenario"] and manifest["grid"] == self.manifest["grid"]:
+                completed = set(manifest["rows"])
+                with open(self.rows_filename) as f:
+                    for line in f:
+                        values = line.strip().split(",")
+                        p_speed = int(values[0])
+                        # a row missing from the manifest may be cut off half way
+                        if p_speed in completed and len(values) == self.width + 1:
+                            self.done[p_speed - min_puller_speed] = [float(v) for v in values[1:]]
+            else:
+                print("Checkpoint belongs to another grid or scenario, starting over")
+
+        # rewrite the rows file with only the trusted rows, so appends start on a clean line
+        with open(self.rows_filename, "w") as f:
+            for i, values in sorted(self.done.items()):
+                f.write(self.format_row(i, values))
+        self.manifest["rows"] = sorted(min_puller_speed + i for i in self.done)
+        self.write_manifest()
+
+    def format_row(self, i, values):
+        return ",".join([str(self.min_puller_speed + i)] + [repr(float(v)) for v in values]) + "\n"
+
+    def write_manifest(self):
+        tmp_filename = self.manifest_filename + ".tmp"
+        with open(tmp_filename, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_filename, self.manifest_filename)
+
+    def fill(self, round_table):
+        for i, values in self.done.items():
+            round_table[i] = values
+
+    def add_row(self, i, values):
+        if i in self.done:
+            return
+        # the row is on disk before the manifest mentions it
+        with open(self.rows_filename, "a") as f:
+            f.write(self.format_row(i, values))
+            f.flush()
+            os.fsync(f.fileno())
+        self.done[i] = list(values)
+        self.manifest["rows"].append(self.min_puller_speed + int(i))
+        self.write_manifest()
+
+    def finish(self):
+        os.remove(self.rows_filename)
+        os.remove(self.manifest_filename)
+
+class SweepStats():
+    def __init__(self):
+        self.evaluated = 0
+        self.filled = 0
+        self.mismatched = 0
+
+    def __str__(self):
+        return f"(evaluated: {self.evaluated}, filled: {self.filled}, mismatched: {self.mismatched})"
+
+def sweep_row_monotone(p_speed, min_runner_speed, max_runner_speed, verify_every=0, stats=None):
+    # the max turn count is (almost) non-decreasing in runner speed, so when both ends of
+    # a runner speed interval give the same count the cells in between are filled without
+    # evaluating them. Exact runner/puller ties can break monotonicity (e.g. puller 184),
+    # verify_every=k re-evaluates every k-th filled cell and fully evaluates any filled run
+    # that turns out wrong; verify_every=1 checks all of them
+    if stats is None:
+        stats = SweepStats()
+    row = np.zeros(max_runner_speed - min_runner_speed + 1)
+    evaluated = set()
+
+    def evaluate(r_speed):
+        j = r_speed - min_runner_speed
+        if j not in evaluated:
+            row[j] = max_turns(runner_speed=r_speed, puller_speed=p_speed)
+            evaluated.add(j)
+            stats.evaluated += 1
+        return row[j]
+
+    filled_runs = []
+
+    def fill(lo, hi):
+        if hi - lo <= 1:
+            return
+        if evaluate(lo) == evaluate(hi):
+            row[lo - min_runner_speed + 1:hi - min_runner_speed] = row[lo - min_runner_speed]
+            filled_runs.append((lo, hi))
+            stats.filled += hi - lo - 1
+        else:
+            mid = (lo + hi) // 2
+            evaluate(mid)
+            fill(lo, mid)
+            fill(mid, hi)
+
+    evaluate(min_runner_speed)
+    fill(min_runner_speed, max_runner_speed)
+
+    if verify_every:
+        count = 0
+        for lo, hi in filled_runs:
+            for r_speed in range(lo + 1, hi):
+                count += 1
+                if count % verify_every:
+                    continue
+                if max_turns(runner_speed=r_speed, puller_speed=p_speed) != row[r_speed - min_runner_speed]:
+                    stats.mismatched += 1
+                    for r in range(lo + 1, hi):
+                        evaluate(r)
+                    break
+    return row
+
+def sweep_monotone(min_puller_speed, max_puller_speed, min_runner_speed, max_runner_speed,
+                   verify_every=0, stats=None):
+    rows = [sweep_row_monotone(p_speed, min_runner_speed, max_runner_speed, verify_every, stats)
+            for p_speed in range(min_puller_speed, max_puller_speed + 1)]
+    return np.array(rows)
+
+def top_k(runner_speed, puller_speed, k):
+    # the k best leaves, best first (ties keep search order, like a stable sort does);
+    # only k leaves are held at a time and only their action series are rebuilt
+    bronya = Puller(puller_speed, ACTION_DISTANCE, has_ultimate=True)
+    firefly = Runner(runner_speed, ACTION_DISTANCE, action_time=0)
+
+    heap = []
+    for seq, (action_time, last_action) in enumerate(iter_leaves(0, firefly, bronya, None)):
+        item = (action_time, -seq, last_action)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    best = sorted(heap, key=lambda x: (x[0], x[1]), reverse=True)
+    return [{"Action Series": trace_action(last_action), "Num of Run": action_time}
+            for action_time, _, last_action in best]
+
+def cycle_boundaries(num_cycles):
+    return [TOTAL_TIME + CYCLE_TIME * c for c in range(num_cycles)]
+
+def max_turns_per_cycle(runner_speed, puller_speed, num_cycles, stats=None):
+    # max runner turns by the end of each of the first num_cycles cycles, from one pass
+    # over the tree up to the last boundary. A branch whose next action jumps over a
+    # boundary is exactly a leaf of the search with TOTAL_TIME set to that boundary, so
+    # it reports its current count there. The search uses an explicit stack (children
+    # are pushed in reverse to keep simulate's order), so deep horizons cannot hit the
+    # recursion limit and the stack stays within two entries per level.
+    # Popped states go through dominated like in iter_leaves: a repeat of a state already
+    # expanded with at least as many runs reaches every boundary with no more runs.
+    # Without it the normal attack branch makes the tree grow exponentially with num_cycles
+    boundaries = cycle_boundaries(num_cycles)
+    horizon = boundaries[-1]
+    best = [0] * num_cycles
+
+    front = {}
+    stack = [(0, Runner(runner_speed, ACTION_DISTANCE, action_time=0),
+              Puller(puller_speed, ACTION_DISTANCE, has_ultimate=True))]
+    while stack:
+        cur_time, runner, puller = stack.pop()
+        if dominated(front, cur_time, runner, puller):
+            if stats is not None:
+                stats.pruned += 1
+            continue
+        if stats is not None:
+            stats.nodes += 1
+
+        for use_ultimate in (1, 0):
+            br_runner = runner
+            br_puller = puller
+
+            if use_ultimate:
+                if not br_puller.has_ultimate:
+                    continue
+                br_runner = br_runner._replace(
+                    left_distance=max(0, br_runner.left_distance - RUNNER_DEDUC * ACTION_DISTANCE))
+                br_puller = br_puller._replace(
+                    left_distance=max(0, br_puller.left_distance - PULLER_DEDUC * ACTION_DISTANCE),
+                    has_ultimate=False)
+
+            runner_time = cal_runner_time(cur_time, br_runner.speed, br_runner.left_distance, HIGH_SPEED_TIME)
+            puller_time = br_puller.left_distance / br_puller.speed
+            runner_acts = runner_time < puller_time or (runner_time == puller_time and not use_ultimate)
+            next_time = cur_time + (runner_time if runner_acts else puller_time)
+
+            for c in range(bisect.bisect_left(boundaries, cur_time), bisect.bisect_left(boundaries, next_time)):
+                best[c] = max(best[c], br_runner.action_time)
+            if next_time > horizon:
+                if stats is not None:
+                    stats.leaves += 1
+                continue
+
+            if runner_acts:
+                stack.append((next_time,
+                              Runner(speed=br_runner.speed,
+                                     left_distance=ACTION_DISTANCE,
+                                     action_time=br_runner.action_time + 1),
+                              br_puller._replace(
+                                  left_distance=br_puller.left_distance - runner_time * br_puller.speed)))
+            else:
+                stack.append((next_time,
+                              br_runner._replace(left_distance=0),
+                              br_puller._replace(left_distance=ACTION_DISTANCE)))
+                if PULLER_NORMAL_ATTACK:
+                    stack.append((next_time,
+                                  br_runner._replace(left_distance=max(0, br_runner.left_distance - cal_runner_distance(
+                                      cur_time, br_runner.speed, puller_time, HIGH_SPEED_TIME))),
+                                  br_puller._replace(
+                                      left_distance=ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC))))
+    return best
+
+if __name__ == "__main__":
+    # dataframes are only needed to write the CSV, importing the engine stays light
+    import pandas as pd
+    from grid_store import save_grid
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes used for the sweep, 1 runs it serially")
+    parser.add_argument("--chunk-size", type=int, default=2,
+                        help="puller speed rows handed to a worker at a time")
+    parser.add_argument("--cache", default=CACHE_FILE,
+                        help="sqlite file that keeps computed cells between runs")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="recompute every cell and leave the cache untouched")
+    parser.add_argument("--profile", action="store_true",
+                        help="also write per-cell search stats next to the CSV (implies --no-cache)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted sweep from its checkpoint")
+    parser.add_argument("--monotone", action="store_true",
+                        help="bisect each row for the runner speeds where the turn count changes")
+    parser.add_argument("--verify-every", type=int, default=0,
+                        help="with --monotone, re-check every n-th filled cell against the full search")
+    parser.add_argument("--normal-attack", action="store_true",
+                        help="let the puller normal attack instead of using the skill (PULLER_NORMAL_ATTACK)")
+    parser.add_argument("--breakpoints", action="store_true",
+                        help=f"compute the exact runner speed steps per puller speed into {BREAKPOINTS_FILE} "
+                             "and fill the CSV from them")
+    args = parser.parse_args()
+    if args.normal_attack:
+        set_normal_attack(True)
+
+    min_puller_speed = 99 + 10
+    max_puller_speed = 185 + 10
+
+    min_runner_speed = 169 + 11
+    max_runner_speed = 255 + 11
+
+    csv_filename = "round_table_with_full_time_other.csv"
+    grid_filename = "round_table_with_full_time_other.npy"
+    if args.breakpoints:
+        table = build_breakpoint_table(range(min_puller_speed, max_puller_speed + 1),
+                                       min_runner_speed, max_runner_speed)
+        table.save(BREAKPOINTS_FILE)
+        print(f"Breakpoint table saved to {BREAKPOINTS_FILE} "
+              f"({sum(len(row) for row in table.thresholds)} thresholds)")
+        round_table = np.array([[table.lookup(r_speed, p_speed)
+                                 for r_speed in range(min_runner_speed, max_runner_speed + 1)]
+                                for p_speed in range(min_puller_speed, max_puller_speed + 1)], dtype=np.float64)
+    elif args.monotone:
+        stats = SweepStats()
+        round_table = sweep_monotone(min_puller_speed, max_puller_speed, min_runner_speed, max_runner_speed,
+                                     verify_every=args.verify_every, stats=stats)
+        print(f"Monotone sweep {stats}")
+    else:
+        cache = None if args.no_cache or args.profile else TurnsCache(scenario_hash(), args.cache)
+        checkpoint = SweepCheckpoint(csv_filename, min_puller_speed, max_puller_speed,
+                                     min_runner_speed, max_runner_speed, resume=args.resume)
+        shape = (max_puller_speed - min_puller_speed + 1, max_runner_speed - min_runner_speed + 1)
+        profile = np.full((len(PROFILE_FIELDS),) + shape, np.nan) if args.profile else None
+        round_table = sweep(min_puller_speed, max_puller_speed, min_runner_speed, max_runner_speed,
+                            workers=args.workers, chunk_size=args.chunk_size, cache=cache, checkpoint=checkpoint,
+                            profile=profile)
+        if cache is not None:
+            cache.close()
+    # write_results_to_file(Results, "my_results.txt")
+
+    runner_speeds = np.arange(min_runner_speed, max_runner_speed + 1)
+    puller_speeds = np.arange(min_puller_speed, max_puller_speed + 1)
+    df = pd.DataFrame(round_table, index=puller_speeds, columns=runner_speeds)
+    df.index.name = 'Puller_speed'
+    df.columns.name = 'Runner_speed'
+
+    df.to_csv(csv_filename)
+    if not args.monotone and not args.breakpoints:
+        checkpoint.finish()
+    print(f"Round table saved to {csv_filename}")
+    save_grid(grid_filename, round_table, puller_speeds, runner_speeds, model_scenario().name, scenario_hash())
+    print(f"Round table grid saved to {grid_filename}")
+    if args.profile and not args.monotone and not args.breakpoints:
+        write_profile(csv_filename, profile, PROFILE_FIELDS, puller_speeds, runner_speeds)
\ No newline at end of file
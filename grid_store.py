@@ -0,0 +1,70 @@
+import json
+import os
+
+import numpy as np
+
+# Binary round tables. The turns live in a plain .npy file that is opened memory-mapped
+# (nothing is read until a cell is touched), and a .json file next to it describes
+# the grid: the puller and runner speed of every row and column and the scenario the
+# sweep ran. The sidecar is checked against the array on open, so an axis can never
+# silently disagree with the data. Parameter sweeps (see parameter_sweep.py) add
+# leading axes, one per swept constant, in front of the puller and runner speeds.
+
+GRID_FORMAT = "hsr-round-table-1"
+
+
+def meta_filename(filename):
+    return os.path.splitext(filename)[0] + ".json"
+
+
+class Grid():
+    def __init__(self, turns, puller_speeds, runner_speeds, scenario, scenario_hash, parameters=None):
+        # turns: (len(values) for every parameter) + (len(puller_speeds), len(runner_speeds)),
+        # a read-only memmap when opened
+        self.turns = turns
+        self.puller_speeds = puller_speeds
+        self.runner_speeds = runner_speeds
+        self.scenario = scenario
+        self.scenario_hash = scenario_hash
+        self.parameters = parameters or {}  # {constant name: values}, in axis order
+
+
+def grid_shape(puller_speeds, runner_speeds, parameters):
+    return tuple(len(values) for values in parameters.values()) + (len(puller_speeds), len(runner_speeds))
+
+
+def save_grid(filename, round_table, puller_speeds, runner_speeds, scenario, scenario_hash, parameters=None):
+    parameters = {name: [float(value) for value in values] for name, values in (parameters or {}).items()}
+    round_table = np.asarray(round_table, dtype=np.float64)
+    puller_speeds = np.asarray(puller_speeds, dtype=np.float64)
+    runner_speeds = np.asarray(runner_speeds, dtype=np.float64)
+    if round_table.shape != grid_shape(puller_speeds, runner_speeds, parameters):
+        raise ValueError(f"round table of shape {round_table.shape} does not match "
+                         f"{grid_shape(puller_speeds, runner_speeds, parameters)} (parameters, puller, runner)")
+    np.save(filename, round_table)
+    meta = {"format": GRID_FORMAT,
+            "array": os.path.basename(filename),
+            "scenario": scenario,
+            "scenario_hash": scenario_hash,
+            "shape": list(round_table.shape),
+            "parameters": [[name, values] for name, values in parameters.items()],
+            "puller_speeds": puller_speeds.tolist(),
+            "runner_speeds": runner_speeds.tolist()}
+    # floats go through repr, so the speeds come back bit for bit
+    with open(meta_filename(filename), "w") as f:
+        json.dump(meta, f)
+
+
+def open_grid(filename):
+    with open(meta_filename(filename)) as f:
+        meta = json.load(f)
+    if meta.get("format") != GRID_FORMAT:
+        raise ValueError(f"{meta_filename(filename)} is not a round table description")
+    turns = np.load(filename, mmap_mode="r")
+    puller_speeds = np.array(meta["puller_speeds"], dtype=np.float64)
+    runner_speeds = np.array(meta["runner_speeds"], dtype=np.float64)
+    parameters = {name: np.array(values, dtype=np.float64) for name, values in meta.get("parameters", [])}
+    shape = grid_shape(puller_speeds, runner_speeds, parameters)
+    if turns.shape != tuple(meta["shape"]) or turns.shape != shape:
+        raise ValueError(f"{filename} has shape {turns.shape}, its description expects {shape}")
+    return Grid(turns, puller_speeds, runner_speeds, meta["scenario"], meta["scenario_hash"], parameters)
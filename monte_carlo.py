@@ -0,0 +1,97 @@
+import argparse
+
+import numpy as np
+
+from full_simulation import RUNNER_DEDUC, PULLER_DEDUC
+from vectorized_simulation import max_turns_vectorized
+
+# Monte Carlo over the uncertain inputs of a cell: the real speeds scatter around the
+# nominal ones (substat rolls), and the ultimate's action advance can take any of a
+# few values (the commented alternatives next to RUNNER_DEDUC / PULLER_DEDUC). Every
+# trial is a full max_turns, and all trials of a batch, over every cell, go through
+# max_turns_vectorized at once. Results only depend on the seed and batch_size.
+
+SEED = 0
+BATCH_SIZE = 1 << 18  # trials (summed over the cells) simulated at once
+
+
+def sample_batch(rng, puller_grid, runner_grid, trials, speed_sigma, runner_deducs, puller_deducs):
+    # (trials, *grid) perturbed inputs
+    shape = (trials,) + puller_grid.shape
+    puller_speed = puller_grid + rng.normal(0, speed_sigma, shape)
+    runner_speed = runner_grid + rng.normal(0, speed_sigma, shape)
+    runner_deduc = rng.choice(np.asarray(runner_deducs, dtype=np.float64), shape)
+    puller_deduc = rng.choice(np.asarray(puller_deducs, dtype=np.float64), shape)
+    return runner_speed, puller_speed, runner_deduc, puller_deduc
+
+
+def monte_carlo_counts(puller_speeds, runner_speeds, trials, seed=SEED, batch_size=BATCH_SIZE, speed_sigma=1.0,
+                       runner_deducs=(RUNNER_DEDUC,), puller_deducs=(PULLER_DEDUC,)):
+    # counts[i, j, n] = trials of cell (puller_speeds[i], runner_speeds[j]) that got n turns
+    rng = np.random.default_rng(seed)
+    puller_grid, runner_grid = np.meshgrid(np.asarray(puller_speeds, dtype=np.float64),
+                                           np.asarray(runner_speeds, dtype=np.float64), indexing="ij")
+    num_cells = puller_grid.size
+    per_batch = max(1, batch_size // num_cells)
+
+    counts = np.zeros((num_cells, 1), dtype=np.int64)
+    cells = np.arange(num_cells)
+    done = 0
+    while done < trials:
+        n = min(per_batch, trials - done)
+        turns = max_turns_vectorized(*sample_batch(rng, puller_grid, runner_grid, n, speed_sigma,
+                                                   runner_deducs, puller_deducs))
+        turns = turns.reshape(n, num_cells)
+        width = max(counts.shape[1], int(turns.max()) + 1)
+        if width > counts.shape[1]:
+            counts = np.pad(counts, ((0, 0), (0, width - counts.shape[1])))
+        counts += np.bincount((cells * width + turns).ravel(), minlength=num_cells * width).reshape(num_cells, width)
+        done += n
+    return counts.reshape(puller_grid.shape + (counts.shape[1],))
+
+
+def reach_probability(counts, target_turns):
+    # probability of at least target_turns per cell
+    return counts[..., target_turns:].sum(axis=-1) / counts.sum(axis=-1)
+
+
+if __name__ == "__main__":
+    # dataframes are only needed to write the CSV, importing the engine stays light
+    import pandas as pd
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=1000, help="trials per cell")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--speed-sigma", type=float, default=1.0,
+                        help="standard deviation of the runner and puller speeds around the grid speed")
+    parser.add_argument("--runner-deducs", type=float, nargs="+", default=[RUNNER_DEDUC],
+                        help="action advance values the ultimate gives the runner, drawn uniformly")
+    parser.add_argument("--puller-deducs", type=float, nargs="+", default=[PULLER_DEDUC],
+                        help="action advance values the ultimate gives the puller, drawn uniformly")
+    parser.add_argument("--target", type=int, default=6, help="turn count whose reach probability goes to the CSV")
+    args = parser.parse_args()
+
+    min_puller_speed = 99 + 10
+    max_puller_speed = 185 + 10
+
+    min_runner_speed = 169 + 11
+    max_runner_speed = 255 + 11
+
+    runner_speeds = np.arange(min_runner_speed, max_runner_speed + 1)
+    puller_speeds = np.arange(min_puller_speed, max_puller_speed + 1)
+    counts = monte_carlo_counts(puller_speeds, runner_speeds, args.trials, seed=args.seed,
+                                batch_size=args.batch_size, speed_sigma=args.speed_sigma,
+                                runner_deducs=args.runner_deducs, puller_deducs=args.puller_deducs)
+
+    npz_filename = "round_table_monte_carlo.npz"
+    np.savez(npz_filename, counts=counts, puller_speeds=puller_speeds, runner_speeds=runner_speeds)
+    print(f"Turn distributions saved to {npz_filename}")
+
+    df = pd.DataFrame(reach_probability(counts, args.target), index=puller_speeds, columns=runner_speeds)
+    df.index.name = 'Puller_speed'
+    df.columns.name = 'Runner_speed'
+
+    csv_filename = f"round_table_monte_carlo_{args.target}_turns.csv"
+    df.to_csv(csv_filename)
+    print(f"Probability of {args.target} turns saved to {csv_filename}")
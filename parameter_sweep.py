@@ -0,0 +1,74 @@
+import itertools
+
+import numpy as np
+
+from scenario import Scenario, Ultimate, compile_scenario
+
+# Sweeps over the ability constants as well as the two speeds, into one N-dimensional
+# array instead of a rerun of the scripts per edited constant. Every combination of
+# constants (a "variant") is compiled once and reused for all speed pairs. TOTAL_TIME
+# variants are not separate kernels: their timelines are the same up to the end of the
+# shortest one, so one search per cell fills the whole TOTAL_TIME axis (see the
+# total_times of compile_scenario). The other constants change the timeline within the
+# first few actions (an ultimate can be used at time 0), so their variants have almost
+# no prefix in common and run in kernels of their own.
+
+# the names of the scripts' constants
+PARAMETERS = ("RUNNER_DEDUC", "PULLER_DEDUC", "RUNNER_DEDUC_2", "PULLER_DEDUC_2",
+              "HIGH_SPEED_TIME", "TOTAL_TIME", "SPEED_UP")
+
+
+def scenario_variant(base, values):
+    # base with some constants replaced, values: {parameter name: value}
+    ultimates = [Ultimate(u.runner_advance, u.puller_advance, u.puller_wins_ties) for u in base.ultimates]
+    fields = {"total_time": base.total_time, "high_speed_time": base.high_speed_time,
+              "action_distance": base.action_distance, "high_speed_loss": base.high_speed_loss,
+              "pull_speed_up": base.pull_speed_up}
+    for name, value in values.items():
+        if name in ("RUNNER_DEDUC", "PULLER_DEDUC", "RUNNER_DEDUC_2", "PULLER_DEDUC_2"):
+            k = 1 if name.endswith("_2") else 0
+            if k >= len(ultimates):
+                raise ValueError(f"{name} needs a scenario with {k + 1} ultimates, {base.name} has {len(ultimates)}")
+            if name.startswith("RUNNER"):
+                ultimates[k].runner_advance = value
+            else:
+                ultimates[k].puller_advance = value
+        elif name == "HIGH_SPEED_TIME":
+            fields["high_speed_time"] = value
+        elif name == "TOTAL_TIME":
+            fields["total_time"] = value
+        elif name == "SPEED_UP":
+            fields["pull_speed_up"] = value
+        else:
+            raise ValueError(f"unknown parameter {name!r}, expected one of {PARAMETERS}")
+    return Scenario(base.name, ultimates, **fields)
+
+
+def parameter_sweep(base, ranges, puller_speeds, runner_speeds):
+    # ranges: {parameter name: values}, in the order of the leading axes of the result;
+    # returns turns of shape (len(values) for every parameter) + (puller speeds, runner speeds)
+    for name in ranges:
+        scenario_variant(base, {name: ranges[name][0]})  # reject unknown names up front
+    names = [name for name in ranges if name != "TOTAL_TIME"]
+    total_times = list(ranges.get("TOTAL_TIME", [base.total_time]))
+    lanes = sorted(set(total_times))
+    lane_of = [lanes.index(t) for t in total_times]
+
+    shape = tuple(len(ranges[name]) for name in names) + (len(total_times), len(puller_speeds), len(runner_speeds))
+    table = np.zeros(shape, dtype=np.float64)
+    for index in itertools.product(*[range(len(ranges[name])) for name in names]):
+        variant = scenario_variant(base, {name: ranges[name][i] for name, i in zip(names, index)})
+        kernel = compile_scenario(variant, total_times=lanes)
+        for i, p_speed in enumerate(puller_speeds):
+            for j, r_speed in enumerate(runner_speeds):
+                turns = kernel.max_turns(float(r_speed), float(p_speed))
+                table[index + (slice(None), i, j)] = [turns[lane] for lane in lane_of]
+
+    # TOTAL_TIME back to where it was asked for
+    axes = names + ["TOTAL_TIME"]
+    order = [axes.index(name) for name in ranges if name in axes]
+    if "TOTAL_TIME" not in ranges:
+        table = table.squeeze(len(names))
+    else:
+        table = table.transpose(order + [len(axes), len(axes) + 1])
+    return table
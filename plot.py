@@ -1,58 +1,95 @@
-import numpy as np
+import os
+
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
 from matplotlib.colors import LinearSegmentedColormap
 
-# Speed ranges
-min_puller_speed = 99 + 10
-max_puller_speed = 185 + 10
-
-min_runner_speed = 169 + 11
-max_runner_speed = 255 + 11
-
-# Load data
-df = pd.read_csv('round_table_with_full_time_other.csv', index_col=0)
-df = df.reset_index(drop=True)
-round_table = df.to_numpy()
-
-# Create labels for the heatmap
-puller_speeds = np.arange(min_puller_speed, max_puller_speed + 1)
-runner_speeds = np.arange(min_runner_speed, max_runner_speed + 1)
-
-# Convert to DataFrame with proper labels
-heatmap_df = pd.DataFrame(
-    round_table,
-    index=puller_speeds,
-    columns=runner_speeds
-)
-
-# # Create custom blue colormap using part of the spectrum
-# blues_cmap = plt.cm.Blues
-# # Use only the range from 0.2 to 0.9 of the Blues colormap (avoiding too light/dark extremes)
-# colors = blues_cmap(np.linspace(0.2, 0.9, 256))
-# custom_blue_cmap = LinearSegmentedColormap.from_list('custom_blues', colors)
-
-# Create the plot
-fig, ax = plt.subplots(figsize=(5, 5))
-
-# Create seaborn heatmap
-sns.heatmap(
-    heatmap_df,
-    cmap="viridis",       # Custom blue colormap with partial spectrum
-    cbar_kws={'label': 'Turns (t)'},
-    ax=ax,
-    xticklabels=10,          # Show every 10th x-tick
-    yticklabels=10           # Show every 10th y-tick
-)
-
-ax.set_xlabel('Firefly\'s speed')
-ax.set_ylabel('Bronya\'s speed')
-ax.set_title('Turns heatmap across speeds')
-
-# Invert y-axis to match your original (smallest speeds at bottom)
-ax.invert_yaxis()
-
-plt.tight_layout()
-plt.savefig("plot.png", dpi=300, format="png")
-plt.show()
\ No newline at end of file
+from grid_store import open_grid
+
+
+def speed_labels(labels):
+    # CSV labels read as floats; whole speeds become ints again so the ticks read 180,
+    # while the labels of `hsr-sim sweep --step 0.5` keep their fraction (200.5)
+    speeds = labels.astype(float)
+    if (speeds == speeds.astype(int)).all():
+        return speeds.astype(int)
+    return speeds
+
+
+def plot_round_table(csv_filename='round_table_with_full_time_other.csv', output="plot.png", show=True):
+    # Load data; the speeds come from the CSV's own labels
+    # (puller 99 + 10 .. 185 + 10, runner 169 + 11 .. 255 + 11 for full_simulation.py)
+    heatmap_df = pd.read_csv(csv_filename, index_col=0)
+    heatmap_df.columns = speed_labels(heatmap_df.columns)
+    heatmap_df.index = speed_labels(heatmap_df.index)
+
+    # # Create custom blue colormap using part of the spectrum
+    # blues_cmap = plt.cm.Blues
+    # # Use only the range from 0.2 to 0.9 of the Blues colormap (avoiding too light/dark extremes)
+    # colors = blues_cmap(np.linspace(0.2, 0.9, 256))
+    # custom_blue_cmap = LinearSegmentedColormap.from_list('custom_blues', colors)
+
+    # Create the plot
+    fig, ax = plt.subplots(figsize=(5, 5))
+
+    # Create seaborn heatmap
+    sns.heatmap(
+        heatmap_df,
+        cmap="viridis",       # Custom blue colormap with partial spectrum
+        cbar_kws={'label': 'Turns (t)'},
+        ax=ax,
+        xticklabels=10,          # Show every 10th x-tick
+        yticklabels=10           # Show every 10th y-tick
+    )
+
+    ax.set_xlabel('Firefly\'s speed')
+    ax.set_ylabel('Bronya\'s speed')
+    ax.set_title('Turns heatmap across speeds')
+
+    # Invert y-axis to match your original (smallest speeds at bottom)
+    ax.invert_yaxis()
+
+    plt.tight_layout()
+    plt.savefig(output, dpi=300, format="png")
+    if show:
+        plt.show()
+    return fig
+
+
+def axis_extent(speeds):
+    # cell edges of an evenly spaced speed axis
+    step = speeds[1] - speeds[0] if len(speeds) > 1 else 1
+    return speeds[0] - step / 2, speeds[-1] + step / 2
+
+
+def plot_grid(grid_filename='round_table_with_full_time_other.npy', output="plot.png", show=True):
+    # Heatmap of a binary round table. The grid is memory-mapped and drawn as one image,
+    # so 0.1 speed resolution grids with millions of cells plot as fast as the CSV one,
+    # and the speeds come from the grid's own description
+    grid = open_grid(grid_filename)
+    if grid.parameters:
+        raise ValueError(f"{grid_filename} also sweeps {', '.join(grid.parameters)}, plot one slice of it")
+
+    fig, ax = plt.subplots(figsize=(5, 5))
+    image = ax.imshow(grid.turns, cmap="viridis", origin="lower", aspect="auto", interpolation="nearest",
+                      extent=axis_extent(grid.runner_speeds) + axis_extent(grid.puller_speeds))
+    fig.colorbar(image, ax=ax, label='Turns (t)')
+
+    ax.set_xlabel('Firefly\'s speed')
+    ax.set_ylabel('Bronya\'s speed')
+    ax.set_title('Turns heatmap across speeds')
+
+    plt.tight_layout()
+    plt.savefig(output, dpi=300, format="png")
+    if show:
+        plt.show()
+    return fig
+
+
+if __name__ == "__main__":
+    # sweeps write the grid next to the CSV; older runs only have the CSV
+    if os.path.exists('round_table_with_full_time_other.npy'):
+        plot_grid()
+    else:
+        plot_round_table()
@@ -1,9 +1,21 @@
-from typing import List, Tuple, Literal
+from typing import List, Tuple, Literal, NamedTuple
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize
-import pandas as pd
-from copy import deepcopy
+import heapq
+import math
+import time
+import os
+import argparse
+import sys
+from multiprocessing import Pool, shared_memory
+
+# helpers shared with full_simulation.py, which live in the repository root; the trace
+# and file helpers are also imported from here by single_simulation.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation_common import (CACHE_FILE, MAX_QUERY_SPEED, MIN_PULLER_SPEED, MIN_RUNNER_SPEED, Action,
+                               TurnsCache, add_leaf, bisect_min_speed, cal_runner_distance, cal_runner_time,
+                               load_traces, scan_min_speed, sweep_rows, trace_action, trace_series,
+                               write_leaves_npz, write_profile, write_results_npz, write_results_to_file)
+from scenario import Scenario, Ultimate, scenario_hash as hash_scenario
 
 # Now simulate the full process 
 TOTAL_TIME = 150
@@ -19,97 +31,286 @@ RUNNER_DEDUC_2 = 0.24 # 0.16
 PULLER_DEDUC_2 = 0.24 # 0.16
 
 PULLER_NORMAL_ATTACK_DEDUC = 0.3
+# let the puller choose a normal attack instead of the skill (no pull and no speed up,
+# its next action comes PULLER_NORMAL_ATTACK_DEDUC sooner), for skill point starved
+# rotations; --normal-attack
+PULLER_NORMAL_ATTACK = False
+
+# speed the puller's pull gives the runner until its next run
+SPEED_UP = 109 * 0.3
+
+# distance slack that keeps the branch and bound estimate above float noise
+BOUND_SLACK = 1e-6
 
 # Results = []
 
-class Action():
-    def __init__(self, action_name, time, par_action):
-        self.action_name = action_name
-        self.time = time
-        self.par_action = par_action
+# immutable state records: a branch derives its own state with _replace instead of
+# deepcopy-ing the parent's, and untouched states are shared between branches
+class Runner(NamedTuple):
+    speed: float
+    left_distance: float
+    action_time: int
+    speed_up_sign: bool
+
+class Puller(NamedTuple):
+    speed: float
+    left_distance: float
+    has_ultimate: bool
+    has_2_ultimate: bool
+
+
+def set_normal_attack(enabled):
+    # also the initializer of the sweep workers, which need not inherit a flag set from
+    # the command line
+    global PULLER_NORMAL_ATTACK
+    PULLER_NORMAL_ATTACK = enabled
+
+def dominated(front, cur_time, runner, puller):
+    # state dedup: a state seen before with the same time, gauges, ultimates and speed up
+    # has the same future, so if it also had at least as many runs this one can be
+    # dropped. Only identical states are compared: with normal attacks a runner or puller
+    # that is closer to acting does not always end with as many runs (e.g. runner 260 /
+    # puller 141). Otherwise the state's runs are kept in front
+    key = (cur_time, runner.left_distance, puller.left_distance, puller.has_ultimate, puller.has_2_ultimate,
+           runner.speed_up_sign)
+    seen = front.get(key)
+    if seen is not None and seen >= runner.action_time:
+        return True
+    front[key] = runner.action_time
+    return False
+
+# per-cell counters written by --profile, in this order
+PROFILE_FIELDS = ("nodes", "leaves", "pruned", "branches_no_ult", "branches_ult", "branches_ult_2", "max_depth",
+                  "runner_time_seconds", "copy_seconds")
+
+class SearchStats():
+    # filled in by the search when passed in; with timing=True the time spent computing
+    # runner times and building child states is measured too. Without stats the search
+    # only pays for the `is not None` checks
+    def __init__(self, timing=False):
+        self.nodes = 0
+        self.leaves = 0
+        self.pruned = 0
+        self.branches_no_ult = 0
+        self.branches_ult = 0
+        self.branches_ult_2 = 0
+        self.max_depth = 0
+        self.timing = timing
+        self.runner_time_seconds = 0.0
+        self.copy_seconds = 0.0
 
     def __str__(self):
-        return f"({self.action_name}, time: {self.time:.2f})"
-
-class Character():
-    def __init__(self, speed, left_distance):
-        self.speed = speed
-        self.left_distance = left_distance
-
-class Runner(Character):
-    def __init__(self, speed, left_distance, action_time, speed_up_sign):
-        super().__init__(speed, left_distance)
-        self.action_time = action_time
-        self.speed_up_sign = speed_up_sign
-
-class Puller(Character):
-    def __init__(self, speed, left_distance, has_ultimate, has_2_ultimate):
-        super().__init__(speed, left_distance)
-        self.has_ultimate = has_ultimate
-        self.has_2_ultimate = has_2_ultimate
-
-
-def trace_action(action):
-    path = [action]
-    while action.par_action is not None:
-        action = action.par_action
-        path.append(action)
-    
-    return list(reversed(path))
-
-def simulate(cur_time, runner, puller, last_action, Results):
+        return f"(nodes: {self.nodes}, leaves: {self.leaves}, pruned: {self.pruned})"
+
+    def as_row(self):
+        return [getattr(self, field) for field in PROFILE_FIELDS]
+
+def upper_bound_runs(cur_time, runner_speed, runner_left, speed_up_sign, puller_speed, puller_left,
+                     has_ultimate, has_2_ultimate):
+    # admissible bound on the runner runs still possible before TOTAL_TIME: every
+    # remaining ultimate is applied in full, the runner keeps its buffed pre-HIGH_SPEED_TIME
+    # speed, and each possible pull saves a whole ACTION_DISTANCE. Takes the fields rather
+    # than the states, so the chains of run_out_leaf and max_runs do not build states for it
+    remaining = TOTAL_TIME - cur_time
+    puller_deduc = (PULLER_DEDUC * ACTION_DISTANCE if has_ultimate else 0) \
+        + (PULLER_DEDUC_2 * ACTION_DISTANCE if has_2_ultimate else 0)
+    runner_deduc = (RUNNER_DEDUC * ACTION_DISTANCE if has_ultimate else 0) \
+        + (RUNNER_DEDUC_2 * ACTION_DISTANCE if has_2_ultimate else 0)
+    max_speed = runner_speed if speed_up_sign else runner_speed + SPEED_UP
+
+    puller_covered = puller_speed * remaining + puller_deduc + BOUND_SLACK
+    if puller_covered < puller_left:
+        num_pull = 0
+    else:
+        num_pull = math.floor((puller_covered - puller_left) / ACTION_DISTANCE) + 1
+
+    runner_covered = max_speed * remaining + runner_deduc + num_pull * ACTION_DISTANCE + BOUND_SLACK
+    if runner_covered < runner_left:
+        return 0
+    return math.floor((runner_covered - runner_left) / ACTION_DISTANCE) + 1
+
+def run_out_leaf(cur_time, runner, puller, last_action, Results=None, stats=None, depth=0):
+    # with both ultimates used the rest of the timeline is a single chain, so it is played
+    # out in a loop instead of one generator per action: same float operations, same
+    # counters and the same bound check at every node. Returns the leaf, or None if the
+    # bound drops the chain on the way.
+    # The loop still takes the runner's runs one at a time: between two pulls there are at
+    # most 3 of them in the sweep range, and counting them in closed form would not add
+    # the times up with the same floats, which decide the exact-tie cells
+    runner_speed, runner_left, action_time, speed_up_sign = runner
+    puller_speed, puller_left = puller.speed, puller.left_distance
+    timed = stats is not None and stats.timing
+    while True:
+        if stats is not None:
+            stats.branches_no_ult += 1
+            if timed:
+                start = time.perf_counter()
+        runner_time = cal_runner_time(cur_time, runner_speed, runner_left, HIGH_SPEED_TIME)
+        if timed:
+            stats.runner_time_seconds += time.perf_counter() - start
+        puller_time = puller_left / puller_speed
+        if runner_time <= puller_time:
+            next_time = cur_time + runner_time
+            if next_time > TOTAL_TIME:
+                return action_time, last_action
+            last_action = Action("runner run", time=next_time, par_action=last_action)
+            if speed_up_sign:
+                runner_speed = runner_speed - SPEED_UP
+                speed_up_sign = False
+            runner_left = ACTION_DISTANCE
+            action_time += 1
+            puller_left = puller_left - runner_time * puller_speed
+        else:
+            next_time = cur_time + puller_time
+            if next_time > TOTAL_TIME:
+                return action_time, last_action
+            last_action = Action("puller pull", time=next_time, par_action=last_action)
+            runner_speed = runner_speed + SPEED_UP
+            speed_up_sign = True
+            runner_left = 0
+            puller_left = ACTION_DISTANCE
+        cur_time = next_time
+        depth += 1
+        if stats is not None:
+            stats.nodes += 1
+            stats.max_depth = max(stats.max_depth, depth)
+        if Results:
+            bound = upper_bound_runs(cur_time, runner_speed, runner_left, speed_up_sign, puller_speed, puller_left,
+                                     False, False)
+            if action_time + bound <= Results[-1]["Num of Run"]:
+                if stats is not None:
+                    stats.pruned += 1
+                return None
+
+def run_out(cur_time, runner_speed, runner_left, speed_up_sign, puller_speed, puller_left, stats=None):
+    # run_out_leaf for max_runs: only the run count, and the chain counts as one node
+    runs = 0
+    timed = stats is not None and stats.timing
+    while True:
+        if timed:
+            start = time.perf_counter()
+        runner_time = cal_runner_time(cur_time, runner_speed, runner_left, HIGH_SPEED_TIME)
+        if timed:
+            stats.runner_time_seconds += time.perf_counter() - start
+        puller_time = puller_left / puller_speed
+        if runner_time <= puller_time:
+            next_time = cur_time + runner_time
+            if next_time > TOTAL_TIME:
+                break
+            if speed_up_sign:
+                runner_speed = runner_speed - SPEED_UP
+                speed_up_sign = False
+            runner_left = ACTION_DISTANCE
+            runs += 1
+            puller_left = puller_left - runner_time * puller_speed
+        else:
+            next_time = cur_time + puller_time
+            if next_time > TOTAL_TIME:
+                break
+            runner_speed = runner_speed + SPEED_UP
+            speed_up_sign = True
+            runner_left = 0
+            puller_left = ACTION_DISTANCE
+        cur_time = next_time
+    if stats is not None:
+        stats.leaves += 1
+    return runs
+
+def iter_leaves(cur_time, runner, puller, last_action, Results=None, stats=None, depth=0, front=None):
+    # yields (Num of Run, last action) for every leaf, depth first; only the current path
+    # is alive, the action series is rebuilt from the par_action chain when needed.
+    # With a front (a dict, see dominated) repeated states are dropped
+    timed = False
+    if stats is not None:
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, depth)
+        timed = stats.timing
+    # when the caller passes its incumbent list, drop the subtree if even the ideal
+    # timeline cannot beat Results[-1]
+    if Results:
+        if runner.action_time + upper_bound_runs(cur_time, runner.speed, runner.left_distance, runner.speed_up_sign,
+                                                 puller.speed, puller.left_distance, puller.has_ultimate,
+                                                 puller.has_2_ultimate) <= Results[-1]["Num of Run"]:
+            if stats is not None:
+                stats.pruned += 1
+            return
+    if front is not None and dominated(front, cur_time, runner, puller):
+        if stats is not None:
+            stats.pruned += 1
+        return
+    # no ultimate left: no choice left either (unless the puller may normal attack),
+    # only the chain to the leaf
+    if not puller.has_ultimate and not puller.has_2_ultimate and not PULLER_NORMAL_ATTACK:
+        leaf = run_out_leaf(cur_time, runner, puller, last_action, Results, stats, depth)
+        if leaf is not None:
+            yield leaf
+        return
+
     # Try both: no-ult first, then ult (if available)
     for use_ultimate in (0, 1):
         for use_2_ultimate in (0,1):
             # snapshot base state for this branch
-            br_runner = deepcopy(runner)
-            br_puller = deepcopy(puller)
+            br_runner = runner
+            br_puller = puller
             br_last_action = last_action
 
             if use_ultimate:
                 if not br_puller.has_ultimate:
                     continue  # can't use it
                 # apply ultimate as an action at current time
+                if timed:
+                    start = time.perf_counter()
                 br_last_action = Action("puller Ultimate", time=cur_time, par_action=br_last_action)
-                br_runner.left_distance = max(0, br_runner.left_distance - RUNNER_DEDUC * ACTION_DISTANCE)
-                br_puller.left_distance = max(0, br_puller.left_distance - PULLER_DEDUC * ACTION_DISTANCE)
-                br_puller.has_ultimate = False
+                br_runner = br_runner._replace(
+                    left_distance=max(0, br_runner.left_distance - RUNNER_DEDUC * ACTION_DISTANCE))
+                br_puller = br_puller._replace(
+                    left_distance=max(0, br_puller.left_distance - PULLER_DEDUC * ACTION_DISTANCE),
+                    has_ultimate=False)
+                if timed:
+                    stats.copy_seconds += time.perf_counter() - start
             
             if use_2_ultimate:
                 if not br_puller.has_2_ultimate:
                     continue
                 # apply ultimate as an action at current time
+                if timed:
+                    start = time.perf_counter()
                 br_last_action = Action("puller Ultimate 2", time=cur_time, par_action=br_last_action)
-                br_runner.left_distance = max(0, br_runner.left_distance - RUNNER_DEDUC_2 * ACTION_DISTANCE)
-                br_puller.left_distance = max(0, br_puller.left_distance - PULLER_DEDUC_2 * ACTION_DISTANCE)
-                br_puller.has_2_ultimate = False
-
+                br_runner = br_runner._replace(
+                    left_distance=max(0, br_runner.left_distance - RUNNER_DEDUC_2 * ACTION_DISTANCE))
+                br_puller = br_puller._replace(
+                    left_distance=max(0, br_puller.left_distance - PULLER_DEDUC_2 * ACTION_DISTANCE),
+                    has_2_ultimate=False)
+                if timed:
+                    stats.copy_seconds += time.perf_counter() - start
+
+            if stats is not None:
+                if use_ultimate:
+                    stats.branches_ult += 1
+                if use_2_ultimate:
+                    stats.branches_ult_2 += 1
+                if not use_ultimate and not use_2_ultimate:
+                    stats.branches_no_ult += 1
+                if timed:
+                    start = time.perf_counter()
             # start from here
-            # change the runner time if time passed the HIGH_SPEED_TIME
-            if cur_time >= HIGH_SPEED_TIME:
-                runner_time = br_runner.left_distance / (br_runner.speed - 60)
-            else:
-                runner_time_tmp = br_runner.left_distance / br_runner.speed
-                if runner_time_tmp + cur_time > HIGH_SPEED_TIME:
-                    dis_after_high_speed = br_runner.left_distance - br_runner.speed * (HIGH_SPEED_TIME - cur_time)
-
-                    runner_time = dis_after_high_speed / (br_runner.speed - 60) + HIGH_SPEED_TIME - cur_time
-                else:
-                    runner_time = runner_time_tmp
-
+            runner_time = cal_runner_time(cur_time, br_runner.speed, br_runner.left_distance, HIGH_SPEED_TIME)
+            if timed:
+                stats.runner_time_seconds += time.perf_counter() - start
             puller_time = br_puller.left_distance / br_puller.speed
 
             # choose next event time; explicit tie-break (puller first only if used ultimate)
             if runner_time < puller_time or (runner_time == puller_time and not use_ultimate):
                 next_time = cur_time + runner_time
                 if next_time > TOTAL_TIME:
-                    Results.append({"Action Series": trace_action(br_last_action),
-                                    "Num of Run": br_runner.action_time})
+                    yield br_runner.action_time, br_last_action
                     continue
                 # runner acts
+                if timed:
+                    start = time.perf_counter()
                 new_action = Action("runner run", time=next_time, par_action=br_last_action)
                 if br_runner.speed_up_sign:
-                    new_runner = Runner(speed=br_runner.speed - 109 * 0.3,
+                    new_runner = Runner(speed=br_runner.speed - SPEED_UP,
                                         left_distance=ACTION_DISTANCE,
                                         action_time=br_runner.action_time + 1,
                                         speed_up_sign=False)
@@ -122,46 +323,66 @@ def simulate(cur_time, runner, puller, last_action, Results):
                                     left_distance=br_puller.left_distance - runner_time * br_puller.speed,
                                     has_ultimate=br_puller.has_ultimate,
                                     has_2_ultimate=br_puller.has_2_ultimate)
-                simulate(next_time, new_runner, new_puller, new_action, Results)
+                if timed:
+                    stats.copy_seconds += time.perf_counter() - start
+                yield from iter_leaves(next_time, new_runner, new_puller, new_action, Results, stats, depth + 1,
+                                       front)
             else:
                 next_time = cur_time + puller_time
                 if next_time > TOTAL_TIME:
-                    Results.append({"Action Series": trace_action(br_last_action),
-                                    "Num of Run": br_runner.action_time})
+                    yield br_runner.action_time, br_last_action
                     continue
                 # puller acts: branch on skill vs normal attack (no mutation of branch roots)
                 # if we just want to test the highest runner rounds, then we always pull
-                # for use_skill in (1, 0):
-                # if use_skill:
-                new_action = Action("puller pull", time=next_time, par_action=br_last_action)
-                new_puller = Puller(speed=br_puller.speed,
-                                    left_distance=ACTION_DISTANCE,
-                                    has_ultimate=br_puller.has_ultimate,
-                                    has_2_ultimate=br_puller.has_2_ultimate)
-                # simulate the speed up given by the puller
-                new_runner = Runner(speed=br_runner.speed + 109 * 0.3,
-                                    left_distance=0,
-                                    action_time=br_runner.action_time,
-                                    speed_up_sign=True)
-                    # else:
-                    #     new_action = Action("puller normal attack", time=next_time, par_action=br_last_action)
-                    #     new_puller = Puller(speed=br_puller.speed,
-                    #                         left_distance=ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC),
-                    #                         has_ultimate=br_puller.has_ultimate)
-                    #     new_runner = Runner(speed=br_runner.speed,
-                    #                         left_distance=br_runner.left_distance - puller_time * br_runner.speed,
-                    #                         action_time=br_runner.action_time)
-                simulate(next_time, new_runner, new_puller, new_action, Results)
+                for use_skill in ((1, 0) if PULLER_NORMAL_ATTACK else (1,)):
+                    if timed:
+                        start = time.perf_counter()
+                    if use_skill:
+                        new_action = Action("puller pull", time=next_time, par_action=br_last_action)
+                        new_puller = Puller(speed=br_puller.speed,
+                                            left_distance=ACTION_DISTANCE,
+                                            has_ultimate=br_puller.has_ultimate,
+                                            has_2_ultimate=br_puller.has_2_ultimate)
+                        # simulate the speed up given by the puller
+                        new_runner = Runner(speed=br_runner.speed + SPEED_UP,
+                                            left_distance=0,
+                                            action_time=br_runner.action_time,
+                                            speed_up_sign=True)
+                    else:
+                        new_action = Action("puller normal attack", time=next_time, par_action=br_last_action)
+                        new_puller = Puller(speed=br_puller.speed,
+                                            left_distance=ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC),
+                                            has_ultimate=br_puller.has_ultimate,
+                                            has_2_ultimate=br_puller.has_2_ultimate)
+                        new_runner = br_runner._replace(
+                            left_distance=max(0, br_runner.left_distance - cal_runner_distance(
+                                cur_time, br_runner.speed, puller_time, HIGH_SPEED_TIME)))
+                    if timed:
+                        stats.copy_seconds += time.perf_counter() - start
+                    yield from iter_leaves(next_time, new_runner, new_puller, new_action, Results, stats,
+                                           depth + 1, front)
+
+
+def simulate(cur_time, runner, puller, last_action, Results, prune=False, stats=None, dominance=False):
+    # branch and bound: Results only holds improving leaves in this mode, so the last one
+    # is the incumbent that iter_leaves prunes against. dominance drops repeated states,
+    # which keeps the search small with PULLER_NORMAL_ATTACK; like prune it only keeps
+    # the best leaves intact
+    for action_time, leaf_action in iter_leaves(cur_time, runner, puller, last_action,
+                                                Results if prune else None, stats,
+                                                front={} if dominance else None):
+        add_leaf(Results, leaf_action, action_time, prune, stats)
     return Results
 
 
-def cal_speed_turns(runner_speed, puller_speed):
+def cal_speed_turns(runner_speed, puller_speed, prune=False, stats=None, dominance=False):
     bronya = Puller(puller_speed, ACTION_DISTANCE, has_ultimate=True, has_2_ultimate=True)
     firefly = Runner(runner_speed, ACTION_DISTANCE, action_time=0, speed_up_sign=False)
 
     # print("I'm here")
     Results = []
-    Results = simulate(cur_time=0, runner=firefly, puller=bronya, last_action=None, Results=Results)
+    Results = simulate(cur_time=0, runner=firefly, puller=bronya, last_action=None, Results=Results,
+                       prune=prune, stats=stats, dominance=dominance)
 
     max_Result = Results[0]
     for i in range(1, len(Results)):
@@ -172,15 +393,204 @@ def cal_speed_turns(runner_speed, puller_speed):
     # return Results
 
 
-def write_results_to_file(Results, filename="results.txt"):
-    with open(filename, 'w') as f:
-        for r in Results:
-            f.write("======= \n")
-            f.write(f"Num of Runner run: {r['Num of Run']}\n")
-            f.write("Action Series: ")
-            for a in r['Action Series']:
-                f.write(str(a))
-            f.write("\n")  # Add newline after each result
+def normalize_state(cur_time, runner_left, puller_left, has_ultimate, has_2_ultimate, speed_up_sign):
+    # action_time and the speeds are left out: the turns still reachable only depend on
+    # where the timeline is, so transposed paths share one memo entry. Floats are kept
+    # exact, rounding them changes the outcome of exact runner/puller ties
+    return (cur_time, runner_left, puller_left, has_ultimate, has_2_ultimate, speed_up_sign)
+
+def max_runs(cur_time, runner_speed, runner_left, speed_up_sign,
+             puller_speed, puller_left, has_ultimate, has_2_ultimate, memo, stats=None, depth=0):
+    # same transitions as simulate, but returns the max number of runner runs
+    # still reachable from this state instead of enumerating every leaf
+    key = normalize_state(cur_time, runner_left, puller_left, has_ultimate, has_2_ultimate, speed_up_sign)
+    if key in memo:
+        return memo[key]
+    # nodes counts the expanded (not memoized) states
+    timed = False
+    if stats is not None:
+        stats.nodes += 1
+        stats.max_depth = max(stats.max_depth, depth)
+        timed = stats.timing
+    if not has_ultimate and not has_2_ultimate and not PULLER_NORMAL_ATTACK:
+        best = run_out(cur_time, runner_speed, runner_left, speed_up_sign, puller_speed, puller_left, stats)
+        memo[key] = best
+        return best
+
+    best = 0
+    for use_ultimate in (0, 1):
+        for use_2_ultimate in (0, 1):
+            br_runner_left = runner_left
+            br_puller_left = puller_left
+            br_has_ultimate = has_ultimate
+            br_has_2_ultimate = has_2_ultimate
+
+            if use_ultimate:
+                if not br_has_ultimate:
+                    continue
+                br_runner_left = max(0, br_runner_left - RUNNER_DEDUC * ACTION_DISTANCE)
+                br_puller_left = max(0, br_puller_left - PULLER_DEDUC * ACTION_DISTANCE)
+                br_has_ultimate = False
+
+            if use_2_ultimate:
+                if not br_has_2_ultimate:
+                    continue
+                br_runner_left = max(0, br_runner_left - RUNNER_DEDUC_2 * ACTION_DISTANCE)
+                br_puller_left = max(0, br_puller_left - PULLER_DEDUC_2 * ACTION_DISTANCE)
+                br_has_2_ultimate = False
+
+            # the ultimates are only tried where they can change the outcome: when even the
+            # ideal timeline after them cannot beat the runs found so far, this node's
+            # value is already known (and the memo stays exact)
+            if (use_ultimate or use_2_ultimate) \
+                    and upper_bound_runs(cur_time, runner_speed, br_runner_left, speed_up_sign, puller_speed,
+                                         br_puller_left, br_has_ultimate, br_has_2_ultimate) <= best:
+                if stats is not None:
+                    stats.pruned += 1
+                continue
+
+            if stats is not None:
+                if use_ultimate:
+                    stats.branches_ult += 1
+                if use_2_ultimate:
+                    stats.branches_ult_2 += 1
+                if not use_ultimate and not use_2_ultimate:
+                    stats.branches_no_ult += 1
+                if timed:
+                    start = time.perf_counter()
+            runner_time = cal_runner_time(cur_time, runner_speed, br_runner_left, HIGH_SPEED_TIME)
+            if timed:
+                stats.runner_time_seconds += time.perf_counter() - start
+            puller_time = br_puller_left / puller_speed
+
+            if runner_time < puller_time or (runner_time == puller_time and not use_ultimate):
+                next_time = cur_time + runner_time
+                if next_time > TOTAL_TIME:
+                    if stats is not None:
+                        stats.leaves += 1
+                    continue
+                # the speed up given by the puller ends with this run
+                new_runner_speed = runner_speed - SPEED_UP if speed_up_sign else runner_speed
+                runs = 1 + max_runs(next_time, new_runner_speed, ACTION_DISTANCE, False,
+                                    puller_speed, br_puller_left - runner_time * puller_speed,
+                                    br_has_ultimate, br_has_2_ultimate, memo, stats, depth + 1)
+            else:
+                next_time = cur_time + puller_time
+                if next_time > TOTAL_TIME:
+                    if stats is not None:
+                        stats.leaves += 1
+                    continue
+                runs = max_runs(next_time, runner_speed + SPEED_UP, 0, True,
+                                puller_speed, ACTION_DISTANCE,
+                                br_has_ultimate, br_has_2_ultimate, memo, stats, depth + 1)
+                if PULLER_NORMAL_ATTACK:
+                    # no pull: the runner keeps its speed (and any speed up still running)
+                    runner_left_after = max(0, br_runner_left - cal_runner_distance(cur_time, runner_speed, puller_time,
+                                                                                     HIGH_SPEED_TIME))
+                    runs = max(runs, max_runs(next_time, runner_speed, runner_left_after,
+                                              speed_up_sign, puller_speed,
+                                              ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC),
+                                              br_has_ultimate, br_has_2_ultimate, memo, stats, depth + 1))
+            best = max(best, runs)
+
+    memo[key] = best
+    return best
+
+def max_turns(runner_speed, puller_speed, stats=None):
+    # equals cal_speed_turns(runner_speed, puller_speed)["Num of Run"]
+    memo = {}
+    return max_runs(0, runner_speed, ACTION_DISTANCE, False,
+                    puller_speed, ACTION_DISTANCE, True, True, memo, stats)
+
+
+def min_runner_speed(target_turns, puller_speed, tolerance=1e-3,
+                     low=MIN_RUNNER_SPEED, high=MAX_QUERY_SPEED):
+    # Firefly speed needed for target_turns with Bronya at puller_speed
+    return bisect_min_speed(lambda speed: max_turns(speed, puller_speed), target_turns, low, high, tolerance)
+
+def min_puller_speed(target_turns, runner_speed, tolerance=1e-3,
+                     low=MIN_PULLER_SPEED, high=MAX_QUERY_SPEED):
+    # Bronya speed needed for target_turns with Firefly at runner_speed; the turns go up
+    # and down with the puller speed, so this scans rather than bisects
+    return scan_min_speed(lambda speed: max_turns(runner_speed, speed), target_turns, low, high, tolerance)
+
+
+def sweep(min_puller_speed, max_puller_speed, min_runner_speed, max_runner_speed, workers=1, chunk_size=2,
+          cache=None, profile=None):
+    # profile, if given, is a (len(PROFILE_FIELDS), *round_table.shape) array that receives
+    # the SearchStats of every computed cell
+    shape = (max_puller_speed - min_puller_speed + 1, max_runner_speed - min_runner_speed + 1)
+    round_table = np.full(shape, np.nan)
+    if cache is not None:
+        cache.fill(round_table, min_puller_speed, min_runner_speed)
+    missing = np.isnan(round_table)
+
+    if workers <= 1:
+        for p_speed in range(min_puller_speed, max_puller_speed + 1):
+            for r_speed in range(min_runner_speed, max_runner_speed + 1):
+                if not missing[p_speed - min_puller_speed][r_speed - min_runner_speed]:
+                    continue
+                stats = SearchStats(timing=True) if profile is not None else None
+                t = max_turns(runner_speed=r_speed, puller_speed=p_speed, stats=stats)
+                round_table[p_speed - min_puller_speed][r_speed - min_runner_speed] = t
+                if profile is not None:
+                    profile[:, p_speed - min_puller_speed, r_speed - min_runner_speed] = stats.as_row()
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=shape[0] * shape[1] * np.dtype(np.float64).itemsize)
+        try:
+            shared_table = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            shared_table[:] = round_table
+            # rows that are fully cached are not handed out at all
+            profile_fields = PROFILE_FIELDS if profile is not None else None
+            tasks = [(max_turns, SearchStats, profile_fields, shm.name, shape, start, min(start + chunk_size, shape[0]),
+                      min_puller_speed, min_runner_speed)
+                     for start in range(0, shape[0], chunk_size)
+                     if missing[start:start + chunk_size].any()]
+            with Pool(workers, initializer=set_normal_attack, initargs=(PULLER_NORMAL_ATTACK,)) as pool:
+                for start, stop, profile_rows in pool.imap_unordered(sweep_rows, tasks):
+                    if profile is not None:
+                        profile[:, start:stop] = profile_rows
+            round_table = shared_table.copy()
+            del shared_table
+        finally:
+            shm.close()
+            shm.unlink()
+
+    if cache is not None:
+        cache.store(round_table, missing, min_puller_speed, min_runner_speed)
+    return round_table
+
+def model_scenario():
+    # this script's constants as a scenario.py Scenario (SCENARIOS["double"] as long as
+    # they are unchanged); only the first ultimate wins exact ties
+    return Scenario("double ultimate", [Ultimate(RUNNER_DEDUC, PULLER_DEDUC),
+                                        Ultimate(RUNNER_DEDUC_2, PULLER_DEDUC_2, puller_wins_ties=False)],
+                    total_time=TOTAL_TIME, high_speed_time=HIGH_SPEED_TIME, action_distance=ACTION_DISTANCE,
+                    pull_speed_up=SPEED_UP)
+
+def scenario_hash():
+    # every constant the turn count depends on; changing one of them starts a new
+    # set of cache entries instead of reusing stale ones. Same scheme as scenario.py, so
+    # files of this script and of `hsr-sim` carry the same hash for the same constants
+    return hash_scenario(model_scenario(), PULLER_NORMAL_ATTACK_DEDUC if PULLER_NORMAL_ATTACK else None)
+
+def top_k(runner_speed, puller_speed, k):
+    # the k best leaves, best first (ties keep search order, like a stable sort does);
+    # only k leaves are held at a time and only their action series are rebuilt
+    bronya = Puller(puller_speed, ACTION_DISTANCE, has_ultimate=True, has_2_ultimate=True)
+    firefly = Runner(runner_speed, ACTION_DISTANCE, action_time=0, speed_up_sign=False)
+
+    heap = []
+    for seq, (action_time, last_action) in enumerate(iter_leaves(0, firefly, bronya, None)):
+        item = (action_time, -seq, last_action)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    best = sorted(heap, key=lambda x: (x[0], x[1]), reverse=True)
+    return [{"Action Series": trace_action(last_action), "Num of Run": action_time}
+            for action_time, _, last_action in best]
 
 # Testing with some speed that will be affected by the speed drop
 
@@ -194,55 +604,79 @@ def write_results_to_file(Results, filename="results.txt"):
 # write_results_to_file(Results)
 # Or specify a custom filename:
 
-min_puller_speed = 99 + 10
-max_puller_speed = 195 + 10
-
-min_runner_speed = 169 + 11
-max_runner_speed = 265 + 11
-
-round_table = np.zeros((max_puller_speed - min_puller_speed + 1, max_runner_speed - min_runner_speed + 1))
-
-for p_speed in range(min_puller_speed, max_puller_speed + 1):
-    for r_speed in range(min_runner_speed, max_runner_speed + 1):
-        max_Result = cal_speed_turns(runner_speed=r_speed, puller_speed=p_speed)
-        t = max_Result['Num of Run']
-        round_table[p_speed - min_puller_speed][r_speed - min_runner_speed] = t
-# write_results_to_file(Results, "my_results.txt")
-
-runner_speeds = np.arange(min_runner_speed, max_runner_speed + 1)
-puller_speeds = np.arange(min_puller_speed, max_puller_speed + 1)
-df = pd.DataFrame(round_table, index=puller_speeds, columns=runner_speeds)
-df.index.name = 'Puller_speed'
-df.columns.name = 'Runner_speed'
-
-csv_filename = "round_table_with_full_time_other.csv"
-df.to_csv(csv_filename)
-print(f"Round table saved to {csv_filename}")
-
-fig, ax = plt.subplots(figsize=(7, 5))
-
-im = ax.imshow(
-    round_table,
-    origin='lower',          # smallest speeds at bottom/left
-    aspect='auto',           # don’t force square pixels
-    interpolation='nearest', # keep sharp grid cells
-    extent=[                 # map array indices to actual speeds
-        min_runner_speed - 0.5, max_runner_speed + 0.5,  # x (columns)
-        min_puller_speed - 0.5, max_puller_speed + 0.5   # y (rows)
-    ]
-)
-
-cbar = plt.colorbar(im, ax=ax)
-cbar.set_label('Turns (t)')
-
-ax.set_xlabel('Runner speed')
-ax.set_ylabel('Puller speed')
-ax.set_title('Turns heatmap across speeds')
-
-# Nice integer ticks every 5 or 10 units (tweak step to taste)
-ax.set_xticks(np.arange(min_runner_speed, max_runner_speed + 1, 10))
-ax.set_yticks(np.arange(min_puller_speed, max_puller_speed + 1, 10))
-
-plt.tight_layout()
-plt.savefig("with 2 wuwuwu other.png", dpi=300)
-plt.show()
+if __name__ == "__main__":
+    # plotting and dataframes are only needed here, importing the engine stays light
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes used for the sweep, 1 runs it serially")
+    parser.add_argument("--chunk-size", type=int, default=2,
+                        help="puller speed rows handed to a worker at a time")
+    parser.add_argument("--cache", default=CACHE_FILE,
+                        help="sqlite file that keeps computed cells between runs")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="recompute every cell and leave the cache untouched")
+    parser.add_argument("--profile", action="store_true",
+                        help="also write per-cell search stats next to the CSV (implies --no-cache)")
+    parser.add_argument("--normal-attack", action="store_true",
+                        help="let the puller normal attack instead of using the skill (PULLER_NORMAL_ATTACK)")
+    args = parser.parse_args()
+    if args.normal_attack:
+        set_normal_attack(True)
+
+    min_puller_speed = 99 + 10
+    max_puller_speed = 195 + 10
+
+    min_runner_speed = 169 + 11
+    max_runner_speed = 265 + 11
+
+    cache = None if args.no_cache or args.profile else TurnsCache(scenario_hash(), args.cache)
+    shape = (max_puller_speed - min_puller_speed + 1, max_runner_speed - min_runner_speed + 1)
+    profile = np.full((len(PROFILE_FIELDS),) + shape, np.nan) if args.profile else None
+    round_table = sweep(min_puller_speed, max_puller_speed, min_runner_speed, max_runner_speed,
+                        workers=args.workers, chunk_size=args.chunk_size, cache=cache, profile=profile)
+    if cache is not None:
+        cache.close()
+    # write_results_to_file(Results, "my_results.txt")
+
+    runner_speeds = np.arange(min_runner_speed, max_runner_speed + 1)
+    puller_speeds = np.arange(min_puller_speed, max_puller_speed + 1)
+    df = pd.DataFrame(round_table, index=puller_speeds, columns=runner_speeds)
+    df.index.name = 'Puller_speed'
+    df.columns.name = 'Runner_speed'
+
+    csv_filename = "round_table_with_full_time_other.csv"
+    df.to_csv(csv_filename)
+    print(f"Round table saved to {csv_filename}")
+    if profile is not None:
+        write_profile(csv_filename, profile, PROFILE_FIELDS, puller_speeds, runner_speeds)
+
+    fig, ax = plt.subplots(figsize=(7, 5))
+
+    im = ax.imshow(
+        round_table,
+        origin='lower',          # smallest speeds at bottom/left
+        aspect='auto',           # don’t force square pixels
+        interpolation='nearest', # keep sharp grid cells
+        extent=[                 # map array indices to actual speeds
+            min_runner_speed - 0.5, max_runner_speed + 0.5,  # x (columns)
+            min_puller_speed - 0.5, max_puller_speed + 0.5   # y (rows)
+        ]
+    )
+
+    cbar = plt.colorbar(im, ax=ax)
+    cbar.set_label('Turns (t)')
+
+    ax.set_xlabel('Runner speed')
+    ax.set_ylabel('Puller speed')
+    ax.set_title('Turns heatmap across speeds')
+
+    # Nice integer ticks every 5 or 10 units (tweak step to taste)
+    ax.set_xticks(np.arange(min_runner_speed, max_runner_speed + 1, 10))
+    ax.set_yticks(np.arange(min_puller_speed, max_puller_speed + 1, 10))
+
+    plt.tight_layout()
+    plt.savefig("with 2 wuwuwu other.png", dpi=300)
+    plt.show()
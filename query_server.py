@@ -0,0 +1,232 @@
+import argparse
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+from scenario import SCENARIOS, compile_scenario
+from simulation_common import MAX_QUERY_SPEED
+
+# Long-running local server for tools that ask for many cells per session. Requests
+# are served by threads; the searches run in a process pool whose workers keep their
+# compiled scenario kernels, and finished cells stay in an LRU result cache shared by
+# all requests. Each search itself starts from an empty memo, as its entries are keyed
+# by the speeds; a repeated cell is answered by the result cache instead.
+#
+#   GET  /turns?runner_speed=193&puller_speed=186&scenario=single  -> {"turns": 6}
+#   POST /batch {"queries": [[193, 186], [181, 200, "double"], ...]} -> {"turns": [6, 3, ...]}
+#   GET  /trace?runner_speed=193&puller_speed=186                   -> {"turns": 6, "actions": [[name, time], ...]}
+#   GET  /stats                                                     -> cache counters
+
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_SIZE = 1 << 20  # cached cells (turns and traces each)
+BATCH_CHUNK = 64      # cells handed to a worker at a time
+
+# per process: kernels are compiled on first use and then reused by every request
+KERNELS = {}
+
+
+def worker_kernel(scenario_name):
+    if scenario_name not in KERNELS:
+        KERNELS[scenario_name] = compile_scenario(SCENARIOS[scenario_name])
+    return KERNELS[scenario_name]
+
+
+def worker_turns(keys):
+    return [worker_kernel(scenario_name).max_turns(runner_speed, puller_speed)
+            for scenario_name, runner_speed, puller_speed in keys]
+
+
+def worker_trace(key):
+    from frontier_simulation import frontier_turns
+
+    scenario_name, runner_speed, puller_speed = key
+    result = frontier_turns(runner_speed, puller_speed, SCENARIOS[scenario_name])
+    return {"turns": result["Num of Run"],
+            "actions": [[a.action_name, float(a.time)] for a in result["Action Series"]]}
+
+
+class LRUCache():
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+
+    def get(self, key):
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.size:
+            self.items.popitem(last=False)
+
+
+class QueryService():
+    # the part of the server that does not know about HTTP; workers=1 computes in the
+    # calling thread instead of starting a pool
+    def __init__(self, workers=1, cache_size=CACHE_SIZE):
+        self.pool = Pool(workers) if workers > 1 else None
+        self.lock = threading.Lock()
+        self.turns_cache = LRUCache(cache_size)
+        self.trace_cache = LRUCache(cache_size)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def turns(self, queries):
+        # queries: (runner_speed, puller_speed, scenario) tuples; one answer per query
+        keys = [query_key(*query) for query in queries]
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key not in found:
+                    value = self.turns_cache.get(key)
+                    if value is not None:
+                        found[key] = value
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            chunks = [missing[i:i + BATCH_CHUNK] for i in range(0, len(missing), BATCH_CHUNK)]
+            if self.pool is not None:
+                results = self.pool.map(worker_turns, chunks)
+            else:
+                results = [worker_turns(chunk) for chunk in chunks]
+            with self.lock:
+                for chunk, values in zip(chunks, results):
+                    for key, value in zip(chunk, values):
+                        self.turns_cache.put(key, value)
+                        found[key] = value
+        return [found[key] for key in keys]
+
+    def trace(self, runner_speed, puller_speed, scenario_name="single"):
+        key = query_key(runner_speed, puller_speed, scenario_name)
+        with self.lock:
+            value = self.trace_cache.get(key)
+        if value is None:
+            value = self.pool.apply(worker_trace, (key,)) if self.pool is not None else worker_trace(key)
+            with self.lock:
+                self.trace_cache.put(key, value)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "cached_turns": len(self.turns_cache.items), "cached_traces": len(self.trace_cache.items)}
+
+
+def query_key(runner_speed, puller_speed, scenario_name="single"):
+    # raises ValueError for queries the search cannot answer, which the handlers turn
+    # into a 400: a puller without speed never acts (division by zero), a runner at or
+    # below the speed it loses after high_speed_time never acts again, and huge speeds
+    # recurse once per action
+    if scenario_name not in SCENARIOS:
+        raise ValueError(f"unknown scenario {scenario_name!r}, expected one of {sorted(SCENARIOS)}")
+    runner_speed, puller_speed = float(runner_speed), float(puller_speed)
+    if not (math.isfinite(runner_speed) and math.isfinite(puller_speed)):
+        raise ValueError("speeds must be finite numbers")
+    high_speed_loss = SCENARIOS[scenario_name].high_speed_loss
+    if not high_speed_loss < runner_speed <= MAX_QUERY_SPEED:
+        raise ValueError(f"runner_speed must be above {high_speed_loss} and at most {MAX_QUERY_SPEED}")
+    if not 0 < puller_speed <= MAX_QUERY_SPEED:
+        raise ValueError(f"puller_speed must be above 0 and at most {MAX_QUERY_SPEED}")
+    return scenario_name, runner_speed, puller_speed
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        service = self.server.service
+        try:
+            if url.path == "/turns":
+                turns, = service.turns([(params["runner_speed"], params["puller_speed"],
+                                         params.get("scenario", "single"))])
+                self.send_json(200, {"turns": turns})
+            elif url.path == "/trace":
+                self.send_json(200, service.trace(params["runner_speed"], params["puller_speed"],
+                                                  params.get("scenario", "single")))
+            elif url.path == "/stats":
+                self.send_json(200, service.stats())
+            else:
+                self.send_json(404, {"error": f"no such endpoint {url.path}"})
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/batch":
+            self.send_json(404, {"error": f"no such endpoint {url.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            turns = self.server.service.turns([tuple(query) for query in body["queries"]])
+            self.send_json(200, {"turns": turns})
+        except (KeyError, TypeError, ValueError) as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host=HOST, port=PORT, workers=1, verbose=False):
+    # port=0 picks a free port, see server.server_address
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = QueryService(workers)
+    server.verbose = verbose
+    return server
+
+
+def request_json(url, payload=None):
+    # small client for scripts and tests: GET without payload, POST with it
+    data = None if payload is None else json.dumps(payload).encode()
+    request = Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def serve(host=HOST, port=PORT, workers=1, verbose=False):
+    server = make_server(host, port, workers, verbose)
+    print(f"Serving on http://{server.server_address[0]}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT, help="0 picks a free port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="search processes, 1 computes in the request threads")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.verbose)
@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import itertools
+
+# Declarative scenarios. full_simulation.py and push_2_limit/full_simulation_2_ultimate.py
+# only differ in their constants, the number of puller ultimates and the pull speed
+# buff; a Scenario describes exactly that, and compile_scenario turns it into a
+# memoized max_turns kernel written for that scenario alone: constants are folded
+# into literals, cal_runner_time is inlined, every ultimate combination is its own
+# straight-line branch and the buff bookkeeping disappears when there is no buff.
+
+
+class Ultimate():
+    # instant puller ability usable once: advances the runner and the puller by a
+    # fraction of ACTION_DISTANCE. With puller_wins_ties the puller takes an exact
+    # runner/puller tie right after it (like the single-ultimate model's ultimate)
+    def __init__(self, runner_advance, puller_advance, puller_wins_ties=True):
+        self.runner_advance = runner_advance
+        self.puller_advance = puller_advance
+        self.puller_wins_ties = puller_wins_ties
+
+    def __repr__(self):
+        return f"Ultimate({self.runner_advance!r}, {self.puller_advance!r}, {self.puller_wins_ties!r})"
+
+
+class Scenario():
+    # pull_speed_up is the speed the puller's pull gives the runner until its next
+    # run; the runner loses high_speed_loss speed once high_speed_time has passed
+    def __init__(self, name, ultimates, total_time=150, high_speed_time=142.857, action_distance=10000,
+                 high_speed_loss=60, pull_speed_up=0):
+        self.name = name
+        self.ultimates = list(ultimates)
+        self.total_time = total_time
+        self.high_speed_time = high_speed_time
+        self.action_distance = action_distance
+        self.high_speed_loss = high_speed_loss
+        self.pull_speed_up = pull_speed_up
+
+    def __repr__(self):
+        return (f"Scenario({self.name!r}, {self.ultimates!r}, total_time={self.total_time!r}, "
+                f"high_speed_time={self.high_speed_time!r}, action_distance={self.action_distance!r}, "
+                f"high_speed_loss={self.high_speed_loss!r}, pull_speed_up={self.pull_speed_up!r})")
+
+
+# the two models of the repo, with the constants of their scripts
+SCENARIOS = {
+    "single": Scenario("single ultimate", [Ultimate(0.24, 0.24)]),
+    "double": Scenario("double ultimate", [Ultimate(0.24, 0.24 + 0.25), Ultimate(0.24, 0.24, puller_wins_ties=False)],
+                       pull_speed_up=109 * 0.3),
+}
+
+# ((min, max) puller speed, (min, max) runner speed) swept by the scenarios' scripts
+SWEEP_RANGES = {
+    "single": ((99 + 10, 185 + 10), (169 + 11, 255 + 11)),
+    "double": ((99 + 10, 195 + 10), (169 + 11, 265 + 11)),
+}
+
+
+def scenario_hash(scenario, normal_attack_deduc=None):
+    # identifies the scenario's constants in files written from its results. The
+    # scripts' searches may also let the puller normal attack, which the scenarios do
+    # not model; they pass its action advance and get hashes of their own
+    text = repr(scenario)
+    if normal_attack_deduc is not None:
+        text += f" with normal attack {normal_attack_deduc!r}"
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class Kernel():
+    def __init__(self, scenario, source, max_runs):
+        self.scenario = scenario
+        self.source = source  # the generated code, for inspection
+        self.max_runs = max_runs
+
+    def max_turns(self, runner_speed, puller_speed):
+        # same value as the max_turns of the scenario's script; a kernel compiled with
+        # total_times gives a tuple, one count per total time
+        s = self.scenario
+        args = [0, runner_speed, s.action_distance]
+        if s.pull_speed_up:
+            args.append(False)
+        args += [puller_speed, s.action_distance]
+        args += [True] * len(s.ultimates)
+        return self.max_runs(*args, {})
+
+
+def runner_time_lines(s, runner_left, indent):
+    # cal_runner_time inlined, keeping its float operations in the same order
+    hst = repr(s.high_speed_time)
+    slow = f"(runner_speed - {s.high_speed_loss!r})"
+    lines = [f"if cur_time >= {hst}:",
+             f"    runner_time = {runner_left} / {slow}",
+             "else:",
+             f"    runner_time = {runner_left} / runner_speed",
+             f"    if runner_time + cur_time > {hst}:",
+             f"        runner_time = ({runner_left} - runner_speed * ({hst} - cur_time)) / {slow} + {hst} - cur_time"]
+    return [indent + line for line in lines]
+
+
+def compile_scenario(scenario, total_times=None):
+    # total_times: ascending times to count turns up to, all in one search. They share the
+    # whole timeline and only differ in which of the last turns still count, so each node
+    # keeps one best per total time ("lane") and the search runs up to the last of them
+    s = scenario
+    lanes = [s.total_time] if total_times is None else list(total_times)
+    total = repr(lanes[-1])
+    n = len(s.ultimates)
+    buff = s.pull_speed_up
+    flags = [f"has_ult_{k}" for k in range(n)]
+    sign = ["speed_up_sign"] if buff else []
+    ad = repr(s.action_distance)
+
+    params = ["cur_time", "runner_speed", "runner_left"] + sign + ["puller_speed", "puller_left"] + flags + ["memo"]
+    key = ["cur_time", "runner_left", "puller_left"] + flags + sign
+    lines = [f"def max_runs({', '.join(params)}):",
+             f"    key = ({', '.join(key)},)",
+             "    if key in memo:",
+             "        return memo[key]"]
+    if total_times is None:
+        lines.append("    best = 0")
+    else:
+        lines += [f"    best_{i} = 0" for i in range(len(lanes))]
+
+    def take(indent, gained):
+        # raise every lane whose total time next_time is within; a single lane
+        # kernel has already counted the run in runs
+        if total_times is None:
+            return [f"{indent}if runs > best:",
+                    f"{indent}    best = runs"]
+        taken = []
+        for i, lane in enumerate(lanes):
+            check = "" if i == len(lanes) - 1 else f"next_time <= {lane!r} and "
+            taken += [f"{indent}if {check}runs[{i}]{gained} > best_{i}:",
+                      f"{indent}    best_{i} = runs[{i}]{gained}"]
+        return taken
+
+    # one branch per subset of the ultimates, applied in order at the current time
+    for used in itertools.product((False, True), repeat=n):
+        indent = "    "
+        names = [k for k in range(n) if used[k]]
+        lines.append(f"{indent}# ultimates used now: {names if names else 'none'}")
+        if names:
+            lines.append(f"{indent}if {' and '.join(flags[k] for k in names)}:")
+            indent += "    "
+        runner_left, puller_left = "runner_left", "puller_left"
+        for k in names:
+            ult = s.ultimates[k]
+            lines += [f"{indent}r_left = {runner_left} - {ult.runner_advance * s.action_distance!r}",
+                      f"{indent}if r_left < 0:",
+                      f"{indent}    r_left = 0",
+                      f"{indent}p_left = {puller_left} - {ult.puller_advance * s.action_distance!r}",
+                      f"{indent}if p_left < 0:",
+                      f"{indent}    p_left = 0"]
+            runner_left, puller_left = "r_left", "p_left"
+        after = ", ".join("False" if used[k] else flags[k] for k in range(n))
+
+        lines += runner_time_lines(s, runner_left, indent)
+        lines.append(f"{indent}puller_time = {puller_left} / puller_speed")
+        # the tie-break is fixed per branch, so it folds into the comparison
+        wins_ties = any(s.ultimates[k].puller_wins_ties for k in names)
+        lines.append(f"{indent}if runner_time {'<' if wins_ties else '<='} puller_time:")
+        lines.append(f"{indent}    next_time = cur_time + runner_time")
+        lines.append(f"{indent}    if next_time <= {total}:")
+        if buff:
+            run_args = ("runner_speed - " + repr(buff) + " if speed_up_sign else runner_speed", ad, "False")
+        else:
+            run_args = ("runner_speed", ad)
+        lines.append(f"{indent}        runs = {'1 + ' if total_times is None else ''}max_runs(next_time, "
+                     f"{', '.join(run_args)}, puller_speed, {puller_left} - runner_time * puller_speed, {after}, memo)")
+        lines += take(indent + "        ", " + 1")
+        lines.append(f"{indent}else:")
+        lines.append(f"{indent}    next_time = cur_time + puller_time")
+        lines.append(f"{indent}    if next_time <= {total}:")
+        if buff:
+            pull_args = (f"runner_speed + {buff!r}", "0", "True")
+        else:
+            pull_args = ("runner_speed", "0")
+        lines.append(f"{indent}        runs = max_runs(next_time, {', '.join(pull_args)}, puller_speed, {ad}, "
+                     f"{after}, memo)")
+        lines += take(indent + "        ", "")
+
+    best = "best" if total_times is None else "(" + "".join(f"best_{i}, " for i in range(len(lanes))) + ")"
+    lines += [f"    memo[key] = {best}",
+              f"    return {best}"]
+    source = "\n".join(lines) + "\n"
+
+    namespace = {}
+    exec(compile(source, f"<scenario {s.name}>", "exec"), namespace)
+    return Kernel(scenario, source, namespace["max_runs"])
+
+
+def round_table(kernel, puller_speeds, runner_speeds):
+    return [[kernel.max_turns(r_speed, p_speed) for r_speed in runner_speeds] for p_speed in puller_speeds]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="single")
+    parser.add_argument("--show-source", action="store_true", help="print the compiled kernel and exit")
+    args = parser.parse_args()
+
+    kernel = compile_scenario(SCENARIOS[args.scenario])
+    if args.show_source:
+        print(kernel.source)
+    else:
+        import numpy as np
+        import pandas as pd
+
+        (min_puller_speed, max_puller_speed), (min_runner_speed, max_runner_speed) = SWEEP_RANGES[args.scenario]
+        puller_speeds = np.arange(min_puller_speed, max_puller_speed + 1)
+        runner_speeds = np.arange(min_runner_speed, max_runner_speed + 1)
+
+        df = pd.DataFrame(round_table(kernel, puller_speeds, runner_speeds), index=puller_speeds,
+                          columns=runner_speeds, dtype=np.float64)
+        df.index.name = 'Puller_speed'
+        df.columns.name = 'Runner_speed'
+
+        csv_filename = "round_table_with_full_time_other.csv"
+        df.to_csv(csv_filename)
+        print(f"Round table saved to {csv_filename}")
+
+        from grid_store import save_grid
+        grid_filename = "round_table_with_full_time_other.npy"
+        save_grid(grid_filename, df.values, puller_speeds, runner_speeds, kernel.scenario.name,
+                  scenario_hash(kernel.scenario))
+        print(f"Round table grid saved to {grid_filename}")
@@ -0,0 +1,230 @@
+import math
+import os
+import sqlite3
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Helpers shared by full_simulation.py and push_2_limit/full_simulation_2_ultimate.py.
+# None of them reads a model's constants: the runner's gauge arithmetic takes the
+# model's HIGH_SPEED_TIME, the sweep worker and the cell cache are handed the model's
+# search and scenario hash, and the rest only deals with actions and files. The models
+# import them from here (and so re-export them), so there is one copy of each.
+
+CACHE_FILE = "turns_cache.sqlite"
+
+# speed range of the inverse queries; the runner needs more than the 60 speed it loses
+# after HIGH_SPEED_TIME
+MIN_RUNNER_SPEED = 61
+MIN_PULLER_SPEED = 1
+MAX_QUERY_SPEED = 1000
+
+
+class Action():
+    __slots__ = ("action_name", "time", "par_action")
+
+    def __init__(self, action_name, time, par_action):
+        self.action_name = action_name
+        self.time = time
+        self.par_action = par_action
+
+    def __str__(self):
+        return f"({self.action_name}, time: {self.time:.2f})"
+
+
+def trace_action(action):
+    path = [action]
+    while action.par_action is not None:
+        action = action.par_action
+        path.append(action)
+
+    return list(reversed(path))
+
+def cal_runner_time(cur_time, speed, left_distance, high_speed_time):
+    # change the runner time if time passed the high_speed_time
+    if cur_time >= high_speed_time:
+        return left_distance / (speed - 60)
+    runner_time_tmp = left_distance / speed
+    if runner_time_tmp + cur_time > high_speed_time:
+        dis_after_high_speed = left_distance - speed * (high_speed_time - cur_time)
+
+        return dis_after_high_speed / (speed - 60) + high_speed_time - cur_time
+    return runner_time_tmp
+
+def cal_runner_distance(cur_time, speed, elapsed, high_speed_time):
+    # distance the runner covers in elapsed from cur_time, slower after high_speed_time
+    if cur_time >= high_speed_time:
+        return elapsed * (speed - 60)
+    if cur_time + elapsed > high_speed_time:
+        return speed * (high_speed_time - cur_time) + (speed - 60) * (cur_time + elapsed - high_speed_time)
+    return elapsed * speed
+
+def bisect_min_speed(turns_at, target_turns, low, high, tolerance):
+    # smallest speed in [low, high] with turns_at(speed) >= target_turns, to within
+    # tolerance (0: down to adjacent floats), assuming turns grow with the speed; None if
+    # even high falls short.
+    # The turns are not exactly monotone (a few exact-tie cells, e.g. puller 184), so
+    # the answer is a threshold with turns_at(answer - tolerance) < target_turns
+    if turns_at(high) < target_turns:
+        return None
+    if turns_at(low) >= target_turns:
+        return low
+    while high - low > tolerance:
+        mid = (low + high) / 2
+        if mid <= low or mid >= high:
+            return high
+        if turns_at(mid) >= target_turns:
+            high = mid
+        else:
+            low = mid
+    # thresholds often sit on round speeds (exact ties), so prefer the grid point of
+    # the tolerance just below the bisection's answer when it still reaches the target
+    snapped = round(math.floor(high / tolerance) * tolerance, 12) if tolerance > 0 else high
+    if low < snapped < high and turns_at(snapped) >= target_turns:
+        return snapped
+    return high
+
+def scan_min_speed(turns_at, target_turns, low, high, tolerance):
+    # like bisect_min_speed, for turns that do not grow with the speed: the puller's
+    # turns rise and fall as its actions move past the runner's (at runner 193, puller
+    # 184 gives 6 turns, 196 only 3 and 384 6 again), so a bisection over the whole
+    # range can land on a later window. Scan the whole speeds upwards for the first one
+    # that reaches target_turns and only bisect the one-unit bracket below it
+    if turns_at(low) >= target_turns:
+        return low
+    for speed in range(math.floor(low) + 1, math.floor(high) + 1):
+        if turns_at(speed) >= target_turns:
+            return bisect_min_speed(turns_at, target_turns, max(low, speed - 1), speed, tolerance)
+    if high > math.floor(high) and turns_at(high) >= target_turns:
+        return bisect_min_speed(turns_at, target_turns, math.floor(high), high, tolerance)
+    return None
+
+def add_leaf(Results, last_action, action_time, prune, stats):
+    if stats is not None:
+        stats.leaves += 1
+    if prune and Results and action_time <= Results[-1]["Num of Run"]:
+        return
+    Results.append({"Action Series": trace_action(last_action),
+                    "Num of Run": action_time})
+
+
+def sweep_rows(task):
+    # worker: fill rows [start, stop) of the shared round_table in place with the model's
+    # max_turns, so only the row range (and the rows' stats when profiling) goes back
+    # through the pool. stats_class is the model's SearchStats, profile_fields its
+    # PROFILE_FIELDS, or None when not profiling
+    max_turns, stats_class, profile_fields, shm_name, shape, start, stop, min_puller_speed, min_runner_speed = task
+    profile = profile_fields is not None
+    profile_rows = np.full((len(profile_fields), stop - start, shape[1]), np.nan) if profile else None
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        round_table = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        for i in range(start, stop):
+            for j in range(shape[1]):
+                # cells that are already known (e.g. from the cache) are not NaN
+                if np.isnan(round_table[i][j]):
+                    stats = stats_class(timing=True) if profile else None
+                    round_table[i][j] = max_turns(runner_speed=min_runner_speed + j,
+                                                  puller_speed=min_puller_speed + i, stats=stats)
+                    if profile:
+                        profile_rows[:, i - start, j] = stats.as_row()
+        del round_table
+    finally:
+        shm.close()
+    return start, stop, profile_rows
+
+class TurnsCache():
+    # persistent max_turns results, keyed by (scenario hash, runner speed, puller speed);
+    # scenario is the scenario_hash() of the model that fills it
+    def __init__(self, scenario, filename=CACHE_FILE):
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS turns ("
+                          "scenario TEXT, runner_speed REAL, puller_speed REAL, turns INTEGER, "
+                          "PRIMARY KEY (scenario, runner_speed, puller_speed))")
+        self.scenario = scenario
+
+    def fill(self, round_table, min_puller_speed, min_runner_speed):
+        # copy the cached cells that fall inside round_table into it
+        rows = self.conn.execute(
+            "SELECT runner_speed, puller_speed, turns FROM turns WHERE scenario = ? "
+            "AND puller_speed BETWEEN ? AND ? AND runner_speed BETWEEN ? AND ?",
+            (self.scenario, min_puller_speed, min_puller_speed + round_table.shape[0] - 1,
+             min_runner_speed, min_runner_speed + round_table.shape[1] - 1))
+        for r_speed, p_speed, t in rows:
+            round_table[int(p_speed) - min_puller_speed][int(r_speed) - min_runner_speed] = t
+
+    def store(self, round_table, mask, min_puller_speed, min_runner_speed):
+        rows = [(self.scenario, min_runner_speed + int(j), min_puller_speed + int(i), int(round_table[i][j]))
+                for i, j in zip(*np.nonzero(mask))]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO turns VALUES (?, ?, ?, ?)", rows)
+
+    def close(self):
+        self.conn.close()
+
+def write_profile(csv_filename, profile, profile_fields, puller_speeds, runner_speeds):
+    # one grid per profile_fields entry, NaN for cells that were not computed (resumed rows)
+    profile_filename = os.path.splitext(csv_filename)[0] + "_profile.npz"
+    np.savez(profile_filename, puller_speeds=puller_speeds, runner_speeds=runner_speeds,
+             **{field: profile[k] for k, field in enumerate(profile_fields)})
+    print(f"Search profile saved to {profile_filename}")
+
+def write_results_to_file(Results, filename="results.txt"):
+    with open(filename, 'w') as f:
+        for r in Results:
+            f.write("======= \n")
+            f.write(f"Num of Runner run: {r['Num of Run']}\n")
+            f.write("Action Series: ")
+            for a in r['Action Series']:
+                f.write(str(a))
+            f.write("\n")  # Add newline after each result
+
+def write_leaves_npz(leaves, filename="results.npz", optimal_only=False):
+    # columnar alternative to write_results_to_file for (Num of Run, last action) leaves,
+    # e.g. straight from iter_leaves. Action names are interned into action_names and
+    # stored as small codes, the actions of all leaves are concatenated into codes/times
+    # and leaf i spans offsets[i]:offsets[i + 1]. optimal_only keeps every distinct
+    # max-turn action series once
+    if optimal_only:
+        best, kept = -1, []
+        for action_time, last_action in leaves:
+            if action_time > best:
+                best, kept = action_time, []
+            if action_time == best:
+                kept.append((action_time, last_action))
+        leaves = kept
+
+    names = {}
+    seen = set()
+    codes, times, offsets, num_of_run = [], [], [0], []
+    for action_time, last_action in leaves:
+        series = trace_action(last_action) if last_action is not None else []
+        if optimal_only:
+            key = tuple((a.action_name, a.time) for a in series)
+            if key in seen:
+                continue
+            seen.add(key)
+        for a in series:
+            codes.append(names.setdefault(a.action_name, len(names)))
+            times.append(a.time)
+        offsets.append(len(codes))
+        num_of_run.append(action_time)
+
+    np.savez(filename, action_names=np.array(list(names), dtype=np.str_),
+             codes=np.array(codes, dtype=np.uint8), times=np.array(times, dtype=np.float64),
+             offsets=np.array(offsets, dtype=np.int64), num_of_run=np.array(num_of_run, dtype=np.int64))
+
+def write_results_npz(Results, filename="results.npz", optimal_only=False):
+    # the Results of simulate / top_k; the last action of a series links back to the rest
+    write_leaves_npz(((r["Num of Run"], r["Action Series"][-1] if r["Action Series"] else None) for r in Results),
+                     filename, optimal_only)
+
+def load_traces(filename="results.npz"):
+    with np.load(filename) as data:
+        return {key: data[key] for key in data.files}
+
+def trace_series(traces, i):
+    # (action name, time) pairs of leaf i of load_traces
+    start, stop = traces["offsets"][i], traces["offsets"][i + 1]
+    names = traces["action_names"]
+    return [(str(names[code]), float(t)) for code, t in zip(traces["codes"][start:stop], traces["times"][start:stop])]
@@ -0,0 +1,217 @@
+import argparse
+import json
+import sys
+
+# hsr-sim: one entry point for the simulator. Only argparse is imported up front;
+# every subcommand imports what it needs, so `hsr-sim query` runs the pure Python
+# scenario kernel without ever loading numpy, pandas or matplotlib.
+
+
+def kernel_for(scenario_name):
+    from scenario import SCENARIOS, compile_scenario
+    return compile_scenario(SCENARIOS[scenario_name])
+
+
+def cmd_query(args):
+    kernel = kernel_for(args.scenario)
+    turns = kernel.max_turns(args.runner_speed, args.puller_speed)
+    if args.json:
+        print(json.dumps({"scenario": args.scenario, "runner_speed": args.runner_speed,
+                          "puller_speed": args.puller_speed, "turns": turns}))
+    else:
+        print(turns)
+    return 0
+
+
+def cmd_speed(args):
+    # inverse query: the runner (or puller) speed needed for --turns
+    from simulation_common import (MAX_QUERY_SPEED, MIN_PULLER_SPEED, MIN_RUNNER_SPEED, bisect_min_speed,
+                                   scan_min_speed)
+
+    kernel = kernel_for(args.scenario)
+    if args.puller_speed is not None:
+        speed = bisect_min_speed(lambda s: kernel.max_turns(s, args.puller_speed), args.turns,
+                                 MIN_RUNNER_SPEED, MAX_QUERY_SPEED, args.tolerance)
+    else:
+        # the turns go up and down with the puller speed, see scan_min_speed
+        speed = scan_min_speed(lambda s: kernel.max_turns(args.runner_speed, s), args.turns,
+                               MIN_PULLER_SPEED, MAX_QUERY_SPEED, args.tolerance)
+    if speed is None:
+        print(f"{args.turns} turns are out of reach below speed {MAX_QUERY_SPEED}", file=sys.stderr)
+        return 1
+    print(speed)
+    return 0
+
+
+def speed_axis(low, high, step):
+    # whole steps keep integer speeds, so the CSV labels read 180 and not 180.0
+    import numpy as np
+
+    count = int(round((high - low) / step)) + 1
+    if float(step).is_integer() and float(low).is_integer():
+        return np.arange(count) * int(step) + int(low)
+    return np.round(low + step * np.arange(count), 10)
+
+
+def parse_vary(text):
+    # NAME=v1,v2,... or NAME=start:stop:step (stop included)
+    from parameter_sweep import PARAMETERS
+
+    name, _, values = text.partition("=")
+    if name not in PARAMETERS:
+        raise argparse.ArgumentTypeError(f"unknown constant {name!r}, expected one of {', '.join(PARAMETERS)}")
+    try:
+        if ":" in values:
+            start, stop, step = (float(v) for v in values.split(":"))
+            values = [round(start + step * i, 10) for i in range(int(round((stop - start) / step)) + 1)]
+        else:
+            values = [float(v) for v in values.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad values in {text!r}, expected v1,v2,... or start:stop:step")
+    return name, values
+
+
+def cmd_sweep(args):
+    import numpy as np
+    import pandas as pd
+    from grid_store import save_grid
+    from scenario import SCENARIOS, SWEEP_RANGES, round_table, scenario_hash
+
+    (min_puller_speed, max_puller_speed), (min_runner_speed, max_runner_speed) = SWEEP_RANGES[args.scenario]
+    if args.puller_range:
+        min_puller_speed, max_puller_speed = args.puller_range
+    if args.runner_range:
+        min_runner_speed, max_runner_speed = args.runner_range
+    puller_speeds = speed_axis(min_puller_speed, max_puller_speed, args.step)
+    runner_speeds = speed_axis(min_runner_speed, max_runner_speed, args.step)
+
+    scenario = SCENARIOS[args.scenario]
+    if args.vary:
+        # one N-dimensional grid; a CSV only holds the two speed axes
+        from parameter_sweep import parameter_sweep
+
+        parameters = dict(args.vary)
+        try:
+            table = parameter_sweep(scenario, parameters, puller_speeds, runner_speeds)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        save_grid(args.grid, table, puller_speeds, runner_speeds, scenario.name, scenario_hash(scenario), parameters)
+        print(f"Round table grid of shape {table.shape} saved to {args.grid}")
+        return 0
+
+    kernel = kernel_for(args.scenario)
+    table = np.array(round_table(kernel, puller_speeds, runner_speeds), dtype=np.float64)
+    save_grid(args.grid, table, puller_speeds, runner_speeds, scenario.name, scenario_hash(scenario))
+    print(f"Round table grid saved to {args.grid}")
+    if not args.no_csv:
+        df = pd.DataFrame(table, index=puller_speeds, columns=runner_speeds)
+        df.index.name = 'Puller_speed'
+        df.columns.name = 'Runner_speed'
+        df.to_csv(args.output)
+        print(f"Round table saved to {args.output}")
+    return 0
+
+
+def cmd_trace(args):
+    from frontier_simulation import frontier_turns
+    from simulation_common import write_results_npz
+    from scenario import SCENARIOS
+
+    result = frontier_turns(args.runner_speed, args.puller_speed, SCENARIOS[args.scenario])
+    print(f"Num of Runner run: {result['Num of Run']}")
+    print("Action Series: " + "".join(str(a) for a in result["Action Series"]))
+    if args.output:
+        write_results_npz([result], args.output)
+        print(f"Trace saved to {args.output}")
+    return 0
+
+
+def cmd_plot(args):
+    if not args.show:
+        import matplotlib
+        matplotlib.use("Agg")
+    from plot import plot_grid, plot_round_table
+
+    if args.input.endswith(".npy"):
+        plot_grid(args.input, args.output, show=args.show)
+    else:
+        plot_round_table(args.input, args.output, show=args.show)
+    print(f"Heatmap saved to {args.output}")
+    return 0
+
+
+def cmd_serve(args):
+    from query_server import serve
+
+    serve(args.host, args.port, args.workers, args.verbose)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="hsr-sim", description="Bronya-Firefly speed/action simulator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_scenario(command):
+        command.add_argument("--scenario", choices=["single", "double"], default="single",
+                             help="single: full_simulation.py, double: push_2_limit/full_simulation_2_ultimate.py")
+
+    query = commands.add_parser("query", help="max runner turns of one speed pair")
+    query.add_argument("runner_speed", type=float)
+    query.add_argument("puller_speed", type=float)
+    add_scenario(query)
+    query.add_argument("--json", action="store_true", help="print a JSON object instead of the bare count")
+    query.set_defaults(func=cmd_query)
+
+    speed = commands.add_parser("speed", help="minimum speed needed for a turn count")
+    speed.add_argument("--turns", type=int, required=True)
+    other = speed.add_mutually_exclusive_group(required=True)
+    other.add_argument("--puller-speed", type=float, help="find the runner speed for this puller speed")
+    other.add_argument("--runner-speed", type=float, help="find the puller speed for this runner speed")
+    speed.add_argument("--tolerance", type=float, default=1e-3)
+    add_scenario(speed)
+    speed.set_defaults(func=cmd_speed)
+
+    sweep = commands.add_parser("sweep", help="round table grid and CSV over a speed grid")
+    add_scenario(sweep)
+    sweep.add_argument("--puller-range", type=float, nargs=2, metavar=("MIN", "MAX"))
+    sweep.add_argument("--runner-range", type=float, nargs=2, metavar=("MIN", "MAX"))
+    sweep.add_argument("--step", type=float, default=1, help="speed resolution of both axes, e.g. 0.1")
+    sweep.add_argument("--output", default="round_table_with_full_time_other.csv")
+    sweep.add_argument("--grid", default="round_table_with_full_time_other.npy",
+                       help="memory-mappable .npy grid, described by the .json next to it")
+    sweep.add_argument("--no-csv", action="store_true", help="only write the grid")
+    sweep.add_argument("--vary", action="append", type=parse_vary, metavar="NAME=VALUES",
+                       help="also sweep a constant, e.g. RUNNER_DEDUC=0.16,0.22,0.24 or TOTAL_TIME=150:200:10; "
+                            "adds a leading grid axis per use and writes no CSV")
+    sweep.set_defaults(func=cmd_sweep)
+
+    trace = commands.add_parser("trace", help="an optimal action series of one speed pair")
+    trace.add_argument("runner_speed", type=float)
+    trace.add_argument("puller_speed", type=float)
+    add_scenario(trace)
+    trace.add_argument("--output", help="also write it as a columnar .npz trace")
+    trace.set_defaults(func=cmd_trace)
+
+    plot = commands.add_parser("plot", help="heatmap of a round table grid or CSV")
+    plot.add_argument("--input", default="round_table_with_full_time_other.npy", help=".npy grid or CSV")
+    plot.add_argument("--output", default="plot.png")
+    plot.add_argument("--show", action="store_true", help="also open the plot window")
+    plot.set_defaults(func=cmd_plot)
+
+    serve = commands.add_parser("serve", help="local HTTP server for many queries, with a shared result cache")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    serve.add_argument("--workers", type=int, default=1, help="search processes, 1 computes in the request threads")
+    serve.add_argument("--verbose", action="store_true", help="log every request")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
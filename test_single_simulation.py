@@ -1,9 +1,6 @@
-from typing import List, Tuple, Literal
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize
-import pandas as pd
-from copy import deepcopy
+from typing import List, Tuple, Literal, NamedTuple
+import heapq
+from full_simulation import cal_runner_distance, dominated, write_leaves_npz
 
 # Now simulate the full process 
 TOTAL_TIME = 150
@@ -16,9 +13,14 @@ RUNNER_DEDUC = 0.24
 PULLER_DEDUC = 0.24
 
 PULLER_NORMAL_ATTACK_DEDUC = 0.3
+# let the puller normal attack instead of using the skill; the tree is then cut down by
+# dropping repeated states (see dominated)
+PULLER_NORMAL_ATTACK = False
 
 
 class Action():
+    __slots__ = ("action_name", "time", "par_action")
+
     def __init__(self, action_name, time, par_action):
         self.action_name = action_name
         self.time = time
@@ -27,20 +29,17 @@ class Action():
     def __str__(self):
         return f"({self.action_name}, time: {self.time:.2f})"
 
-class Character():
-    def __init__(self, speed, left_distance):
-        self.speed = speed
-        self.left_distance = left_distance
-
-class Runner(Character):
-    def __init__(self, speed, left_distance, action_time):
-        super().__init__(speed, left_distance)
-        self.action_time = action_time
+# immutable state records: a branch derives its own state with _replace instead of
+# deepcopy-ing the parent's, and untouched states are shared between branches
+class Runner(NamedTuple):
+    speed: float
+    left_distance: float
+    action_time: int
 
-class Puller(Character):
-    def __init__(self, speed, left_distance, has_ultimate):
-        super().__init__(speed, left_distance)
-        self.has_ultimate = has_ultimate
+class Puller(NamedTuple):
+    speed: float
+    left_distance: float
+    has_ultimate: bool
 
 
 def trace_action(action):
@@ -51,12 +50,17 @@ def trace_action(action):
     
     return list(reversed(path))
 
-def simulate(cur_time, runner, puller, last_action, Results):
+def iter_leaves(cur_time, runner, puller, last_action, front=None):
+    # yields (Num of Run, last action) for every leaf, depth first; only the current path
+    # is alive, the action series is rebuilt from the par_action chain when needed.
+    # With a front (a dict, see dominated) repeated states are dropped
+    if front is not None and dominated(front, cur_time, runner, puller):
+        return
     # Try both: no-ult first, then ult (if available)
     for use_ultimate in (0, 1):
         # snapshot base state for this branch
-        br_runner = deepcopy(runner)
-        br_puller = deepcopy(puller)
+        br_runner = runner
+        br_puller = puller
         br_last_action = last_action
 
         if use_ultimate:
@@ -64,9 +68,11 @@ def simulate(cur_time, runner, puller, last_action, Results):
                 continue  # can't use it
             # apply ultimate as an action at current time
             br_last_action = Action("puller Ultimate", time=cur_time, par_action=br_last_action)
-            br_runner.left_distance = max(0, br_runner.left_distance - RUNNER_DEDUC * ACTION_DISTANCE)
-            br_puller.left_distance = max(0, br_puller.left_distance - PULLER_DEDUC * ACTION_DISTANCE)
-            br_puller.has_ultimate = False
+            br_runner = br_runner._replace(
+                left_distance=max(0, br_runner.left_distance - RUNNER_DEDUC * ACTION_DISTANCE))
+            br_puller = br_puller._replace(
+                left_distance=max(0, br_puller.left_distance - PULLER_DEDUC * ACTION_DISTANCE),
+                has_ultimate=False)
        
         # start from here
         # change the runner time if time passed the HIGH_SPEED_TIME
@@ -87,8 +93,7 @@ def simulate(cur_time, runner, puller, last_action, Results):
         if runner_time < puller_time or (runner_time == puller_time and not use_ultimate):
             next_time = cur_time + runner_time
             if next_time > TOTAL_TIME:
-                Results.append({"Action Series": trace_action(br_last_action),
-                                "Num of Run": br_runner.action_time})
+                yield br_runner.action_time, br_last_action
                 continue
             # runner acts
             new_action = Action("runner run", time=next_time, par_action=br_last_action)
@@ -98,34 +103,41 @@ def simulate(cur_time, runner, puller, last_action, Results):
             new_puller = Puller(speed=br_puller.speed,
                                 left_distance=br_puller.left_distance - runner_time * br_puller.speed,
                                 has_ultimate=br_puller.has_ultimate)
-            simulate(next_time, new_runner, new_puller, new_action, Results)
+            yield from iter_leaves(next_time, new_runner, new_puller, new_action, front)
         else:
             next_time = cur_time + puller_time
             if next_time > TOTAL_TIME:
-                Results.append({"Action Series": trace_action(br_last_action),
-                                "Num of Run": br_runner.action_time})
+                yield br_runner.action_time, br_last_action
                 continue
             # puller acts: branch on skill vs normal attack (no mutation of branch roots)
             # if we just want to test the highest runner rounds, then we always pull
-            # for use_skill in (1, 0):
-            # if use_skill:
-            new_action = Action("puller pull", time=next_time, par_action=br_last_action)
-            new_puller = Puller(speed=br_puller.speed,
-                                left_distance=ACTION_DISTANCE,
-                                has_ultimate=br_puller.has_ultimate,
-                                )
-            new_runner = Runner(speed=br_runner.speed,
-                                left_distance=0,
-                                action_time=br_runner.action_time)
-                # else:
-                #     new_action = Action("puller normal attack", time=next_time, par_action=br_last_action)
-                #     new_puller = Puller(speed=br_puller.speed,
-                #                         left_distance=ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC),
-                #                         has_ultimate=br_puller.has_ultimate)
-                #     new_runner = Runner(speed=br_runner.speed,
-                #                         left_distance=br_runner.left_distance - puller_time * br_runner.speed,
-                #                         action_time=br_runner.action_time)
-            simulate(next_time, new_runner, new_puller, new_action, Results)
+            for use_skill in ((1, 0) if PULLER_NORMAL_ATTACK else (1,)):
+                if use_skill:
+                    new_action = Action("puller pull", time=next_time, par_action=br_last_action)
+                    new_puller = Puller(speed=br_puller.speed,
+                                        left_distance=ACTION_DISTANCE,
+                                        has_ultimate=br_puller.has_ultimate,
+                                        )
+                    new_runner = Runner(speed=br_runner.speed,
+                                        left_distance=0,
+                                        action_time=br_runner.action_time)
+                else:
+                    new_action = Action("puller normal attack", time=next_time, par_action=br_last_action)
+                    new_puller = Puller(speed=br_puller.speed,
+                                        left_distance=ACTION_DISTANCE * (1 - PULLER_NORMAL_ATTACK_DEDUC),
+                                        has_ultimate=br_puller.has_ultimate)
+                    new_runner = Runner(speed=br_runner.speed,
+                                        left_distance=max(0, br_runner.left_distance
+                                                             - cal_runner_distance(cur_time, br_runner.speed,
+                                                                                   puller_time, HIGH_SPEED_TIME)),
+                                        action_time=br_runner.action_time)
+                yield from iter_leaves(next_time, new_runner, new_puller, new_action, front)
+
+
+def simulate(cur_time, runner, puller, last_action, Results):
+    for action_time, leaf_action in iter_leaves(cur_time, runner, puller, last_action):
+        Results.append({"Action Series": trace_action(leaf_action),
+                        "Num of Run": action_time})
     return Results
 
 
@@ -141,6 +153,26 @@ def cal_speed_turns(runner_speed, puller_speed):
     return Results
 
 
+def top_k(runner_speed, puller_speed, k, dominance=False):
+    # the k best leaves, best first (ties keep search order, like a stable sort does);
+    # only k leaves are held at a time and only their action series are rebuilt.
+    # dominance drops repeated states, then only the best leaves are sure to be there
+    bronya = Puller(puller_speed, ACTION_DISTANCE, has_ultimate=True)
+    firefly = Runner(runner_speed, ACTION_DISTANCE, action_time=0)
+
+    heap = []
+    for seq, (action_time, last_action) in enumerate(iter_leaves(0, firefly, bronya, None,
+                                                                  front={} if dominance else None)):
+        item = (action_time, -seq, last_action)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    best = sorted(heap, key=lambda x: (x[0], x[1]), reverse=True)
+    return [{"Action Series": trace_action(last_action), "Num of Run": action_time}
+            for action_time, _, last_action in best]
+
 def write_results_to_file(Results, filename="results.txt"):
     with open(filename, 'w') as f:
         for r in Results:
@@ -152,5 +184,15 @@ def write_results_to_file(Results, filename="results.txt"):
             f.write("\n")  # Add newline after each result
 
 
-Results = cal_speed_turns(runner_speed=193, puller_speed=186)
-write_results_to_file(Results)
\ No newline at end of file
+
+if __name__ == "__main__":
+    # only the best rotations are kept, cal_speed_turns still returns every leaf
+    Results = top_k(runner_speed=193, puller_speed=186, k=10, dominance=PULLER_NORMAL_ATTACK)
+    write_results_to_file(Results)
+
+    # every distinct optimal rotation of the full tree, in columnar form (with normal
+    # attacks only those that survive the dedup of repeated states)
+    write_leaves_npz(iter_leaves(0, Runner(193, ACTION_DISTANCE, action_time=0),
+                                 Puller(186, ACTION_DISTANCE, has_ultimate=True), None,
+                                 front={} if PULLER_NORMAL_ATTACK else None),
+                     "results.npz", optimal_only=True)
\ No newline at end of file
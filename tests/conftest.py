@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the scripts are flat modules; the double ultimate model lives in push_2_limit and is
+# appended, so the root plot.py keeps shadowing push_2_limit/plot.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.append(os.path.join(ROOT, "push_2_limit"))
@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+import full_simulation
+import full_simulation_2_ultimate
+from frontier_simulation import frontier_turns
+from scenario import SCENARIOS, SWEEP_RANGES, compile_scenario, round_table, scenario_hash
+from simulation_common import TurnsCache
+from vectorized_simulation import round_table_vectorized
+
+# every engine against the exhaustive search (cal_speed_turns without pruning, which
+# enumerates every leaf) on a subgrid of each model's sweep; puller 184 holds the
+# exact-tie cells
+
+
+def subgrid(name, step=4):
+    (min_puller, max_puller), (min_runner, max_runner) = SWEEP_RANGES[name]
+    puller_speeds = sorted(set(range(min_puller, max_puller + 1, step)) | {184})
+    return puller_speeds, list(range(min_runner, max_runner + 1, step))
+
+
+def exhaustive_table(model, puller_speeds, runner_speeds):
+    return [[model.cal_speed_turns(r_speed, p_speed)["Num of Run"] for r_speed in runner_speeds]
+            for p_speed in puller_speeds]
+
+
+@pytest.fixture(scope="module")
+def single_grid():
+    puller_speeds, runner_speeds = subgrid("single")
+    return puller_speeds, runner_speeds, exhaustive_table(full_simulation, puller_speeds, runner_speeds)
+
+
+@pytest.fixture(scope="module")
+def double_grid():
+    puller_speeds, runner_speeds = subgrid("double", step=8)
+    return puller_speeds, runner_speeds, exhaustive_table(full_simulation_2_ultimate, puller_speeds, runner_speeds)
+
+
+@pytest.mark.parametrize("model, grid", [(full_simulation, "single_grid"), (full_simulation_2_ultimate, "double_grid")])
+def test_max_turns(model, grid, request):
+    puller_speeds, runner_speeds, expected = request.getfixturevalue(grid)
+    assert [[model.max_turns(r, p) for r in runner_speeds] for p in puller_speeds] == expected
+
+
+@pytest.mark.parametrize("model, grid", [(full_simulation, "single_grid"), (full_simulation_2_ultimate, "double_grid")])
+def test_pruned_search(model, grid, request):
+    puller_speeds, runner_speeds, expected = request.getfixturevalue(grid)
+    assert [[model.cal_speed_turns(r, p, prune=True)["Num of Run"] for r in runner_speeds]
+            for p in puller_speeds] == expected
+
+
+@pytest.mark.parametrize("name, grid", [("single", "single_grid"), ("double", "double_grid")])
+def test_compiled_kernel(name, grid, request):
+    puller_speeds, runner_speeds, expected = request.getfixturevalue(grid)
+    assert round_table(compile_scenario(SCENARIOS[name]), puller_speeds, runner_speeds) == expected
+
+
+@pytest.mark.parametrize("name, grid", [("single", "single_grid"), ("double", "double_grid")])
+def test_frontier_turns(name, grid, request):
+    puller_speeds, runner_speeds, expected = request.getfixturevalue(grid)
+    assert [[frontier_turns(r, p, SCENARIOS[name])["Num of Run"] for r in runner_speeds]
+            for p in puller_speeds] == expected
+
+
+def test_round_table_vectorized(single_grid):
+    puller_speeds, runner_speeds, expected = single_grid
+    np.testing.assert_array_equal(round_table_vectorized(puller_speeds, runner_speeds), expected)
+
+
+def test_max_turns_per_cycle(monkeypatch):
+    # cycle c ends where a search with TOTAL_TIME at that boundary stops
+    num_cycles = 3
+    cells = [(r, p) for p in (120, 150, 184, 195) for r in (180, 217, 266)]
+    per_cycle = {cell: full_simulation.max_turns_per_cycle(*cell, num_cycles) for cell in cells}
+    for c, boundary in enumerate(full_simulation.cycle_boundaries(num_cycles)):
+        monkeypatch.setattr(full_simulation, "TOTAL_TIME", boundary)
+        for cell in cells:
+            assert per_cycle[cell][c] == full_simulation.cal_speed_turns(*cell)["Num of Run"], (cell, c)
+
+
+def test_breakpoint_table():
+    # rows without isolated exact-tie cells, which the table does not represent
+    puller_speeds = [130, 160]
+    table = full_simulation.build_breakpoint_table(puller_speeds, 180, 266)
+    for p_speed in puller_speeds:
+        for r_speed in np.arange(180, 266.5, 1.5):
+            expected = full_simulation.cal_speed_turns(float(r_speed), p_speed)["Num of Run"]
+            assert table.lookup(float(r_speed), p_speed) == expected, (r_speed, p_speed)
+    # every threshold is the first runner speed of its turn count
+    for p_speed, row in zip(puller_speeds, table.thresholds):
+        for threshold in row:
+            below = np.nextafter(threshold, 0)
+            assert full_simulation.max_turns(below, p_speed) < full_simulation.max_turns(threshold, p_speed)
+
+
+def test_checkpoint_resume(tmp_path):
+    csv_filename = str(tmp_path / "round_table.csv")
+    grid = (180, 185, 190, 200)
+    expected = full_simulation.sweep(*grid)
+
+    # an interrupted sweep: two rows done, a third cut off half way before the manifest knew it
+    checkpoint = full_simulation.SweepCheckpoint(csv_filename, *grid)
+    checkpoint.add_row(0, expected[0])
+    checkpoint.add_row(3, expected[3])
+    with open(checkpoint.rows_filename, "a") as f:
+        f.write(checkpoint.format_row(4, expected[4])[:20])
+
+    resumed = full_simulation.SweepCheckpoint(csv_filename, *grid, resume=True)
+    assert sorted(resumed.done) == [0, 3]
+    np.testing.assert_array_equal(full_simulation.sweep(*grid, checkpoint=resumed), expected)
+
+    # another grid does not resume from it
+    other = full_simulation.SweepCheckpoint(csv_filename, 180, 186, 190, 200, resume=True)
+    assert other.done == {}
+
+
+def test_turns_cache_invalidated_by_constants(tmp_path, monkeypatch):
+    filename = str(tmp_path / "cache.sqlite")
+    grid = (180, 183, 190, 195)
+    cache = TurnsCache(full_simulation.scenario_hash(), filename)
+    expected = full_simulation.sweep(*grid, cache=cache)
+    cache.close()
+
+    cached = np.full(expected.shape, np.nan)
+    cache = TurnsCache(full_simulation.scenario_hash(), filename)
+    cache.fill(cached, grid[0], grid[2])
+    cache.close()
+    np.testing.assert_array_equal(cached, expected)
+
+    # other constants hash differently and miss every cached cell
+    old_hash = full_simulation.scenario_hash()
+    monkeypatch.setattr(full_simulation, "RUNNER_DEDUC", 0.3)
+    assert full_simulation.scenario_hash() != old_hash
+    stale = np.full(expected.shape, np.nan)
+    cache = TurnsCache(full_simulation.scenario_hash(), filename)
+    cache.fill(stale, grid[0], grid[2])
+    cache.close()
+    assert np.isnan(stale).all()
+
+
+@pytest.mark.parametrize("model, name", [(full_simulation, "single"), (full_simulation_2_ultimate, "double")])
+def test_scripts_and_scenarios_share_hashes(model, name, monkeypatch):
+    # grids, caches and checkpoints of the scripts and of hsr-sim name the same constants alike
+    assert model.scenario_hash() == scenario_hash(SCENARIOS[name])
+    monkeypatch.setattr(model, "PULLER_NORMAL_ATTACK", True)
+    assert model.scenario_hash() != scenario_hash(SCENARIOS[name])
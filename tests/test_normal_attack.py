@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+import full_simulation
+import full_simulation_2_ultimate
+
+# with normal attacks the leaf search only stays small through dominated, which may only
+# drop states whose future is the same as one already searched
+
+
+@pytest.fixture
+def normal_attack():
+    for model in (full_simulation, full_simulation_2_ultimate):
+        model.set_normal_attack(True)
+    yield
+    for model in (full_simulation, full_simulation_2_ultimate):
+        model.set_normal_attack(False)
+
+
+def random_cells(seed, count):
+    rng = random.Random(seed)
+    return [(rng.uniform(180, 280), rng.uniform(100, 205)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("model, cells", [
+    (full_simulation, random_cells(0, 200) + [(259.8269, 102.1214)]),
+    (full_simulation_2_ultimate, random_cells(1, 60) + [(260, 141), (262, 141), (256, 143)]),
+])
+def test_dominance_keeps_best_count(model, cells, normal_attack):
+    for runner_speed, puller_speed in cells:
+        assert model.cal_speed_turns(runner_speed, puller_speed, dominance=True)["Num of Run"] \
+            == model.max_turns(runner_speed, puller_speed), (runner_speed, puller_speed)
+
+
+def test_max_turns_per_cycle(normal_attack, monkeypatch):
+    num_cycles = 2
+    cells = random_cells(2, 30) + [(257.7221, 100.8195), (275.2132, 108.2079)]
+    per_cycle = {cell: full_simulation.max_turns_per_cycle(*cell, num_cycles) for cell in cells}
+    for c, boundary in enumerate(full_simulation.cycle_boundaries(num_cycles)):
+        monkeypatch.setattr(full_simulation, "TOTAL_TIME", boundary)
+        for cell in cells:
+            assert per_cycle[cell][c] == full_simulation.max_turns(*cell), (cell, c)
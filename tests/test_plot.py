@@ -0,0 +1,11 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("seaborn")
+from plot import speed_labels
+
+
+def test_speed_labels_keep_fractional_steps():
+    assert list(speed_labels(pd.Index(["200.0", "200.5", "201.0"]))) == [200.0, 200.5, 201.0]
+    assert list(speed_labels(pd.Index(["200.0", "201.0"]))) == [200, 201]
+    assert list(speed_labels(pd.Index(["200", "201"]))) == [200, 201]
@@ -0,0 +1,39 @@
+import threading
+from urllib.error import HTTPError
+
+import pytest
+
+from query_server import QueryService, make_server, query_key, request_json
+
+
+@pytest.mark.parametrize("runner_speed, puller_speed", [
+    (193, 0), (193, -5), (60, 186), (-193, 186), ("nan", 186), (193, "inf"), (1e9, 186),
+])
+def test_query_key_rejects_speeds_the_search_cannot_answer(runner_speed, puller_speed):
+    with pytest.raises(ValueError):
+        query_key(runner_speed, puller_speed)
+
+
+def test_service_answers_like_the_kernel():
+    service = QueryService(workers=1)
+    assert service.turns([(193, 186, "single"), (193, 186, "single")]) == [6, 6]
+    assert service.stats()["misses"] == 1
+
+
+def test_bad_query_in_batch_gets_400():
+    server = make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+        assert request_json(url + "/batch", {"queries": [[193, 186]]}) == {"turns": [6]}
+        with pytest.raises(HTTPError) as e:
+            request_json(url + "/batch", {"queries": [[193, 186], [193, 0]]})
+        assert e.value.code == 400
+        with pytest.raises(HTTPError) as e:
+            request_json(url + "/turns?runner_speed=193&puller_speed=-1")
+        assert e.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.service.close()
@@ -0,0 +1,38 @@
+import pytest
+
+import full_simulation
+import full_simulation_2_ultimate
+from simulation_common import MIN_PULLER_SPEED, bisect_min_speed
+
+
+def brute_min_puller_speed(model, target_turns, runner_speed, high=500):
+    # first whole puller speed that reaches target_turns
+    for speed in range(MIN_PULLER_SPEED, high + 1):
+        if model.max_turns(runner_speed, speed) >= target_turns:
+            return speed
+    return None
+
+
+@pytest.mark.parametrize("model", [full_simulation, full_simulation_2_ultimate])
+@pytest.mark.parametrize("runner_speed", [180, 186, 193, 205, 217, 230, 244, 258])
+@pytest.mark.parametrize("target_turns", [3, 4, 5, 6, 7])
+def test_min_puller_speed_matches_scan(model, runner_speed, target_turns):
+    expected = brute_min_puller_speed(model, target_turns, runner_speed)
+    speed = model.min_puller_speed(target_turns, runner_speed, high=500)
+    if expected is None:
+        assert speed is None
+        return
+    # the answer sits in the one-unit bracket below the first whole speed that works
+    assert expected - 1 < speed <= expected
+    assert model.max_turns(runner_speed, speed) >= target_turns
+
+
+def test_min_puller_speed_before_later_window():
+    # puller 184 gives 6 turns at runner 193, 196-248 only 3 and 384 6 again
+    assert full_simulation.min_puller_speed(6, 193) == 184
+    assert full_simulation.min_puller_speed(5, 186) == 184
+
+
+def test_bisect_min_speed_stops_at_zero_tolerance():
+    speed = bisect_min_speed(lambda s: 1 if s >= 200.5 else 0, 1, 100, 300, 0)
+    assert speed == 200.5
@@ -0,0 +1,13 @@
+from full_simulation import max_turns
+from scenario import SWEEP_RANGES
+from timeline import TIE_CELLS, max_turns_timeline
+
+
+def test_timeline_grid_matches_search():
+    # the whole single ultimate sweep; only the documented exact-tie cells may differ
+    (min_puller, max_puller), (min_runner, max_runner) = SWEEP_RANGES["single"]
+    mismatches = {(puller_speed, runner_speed)
+                  for puller_speed in range(min_puller, max_puller + 1)
+                  for runner_speed in range(min_runner, max_runner + 1)
+                  if max_turns_timeline(runner_speed, puller_speed) != max_turns(runner_speed, puller_speed)}
+    assert mismatches == TIE_CELLS
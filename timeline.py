@@ -0,0 +1,187 @@
+import heapq
+import itertools
+
+from full_simulation import TOTAL_TIME, HIGH_SPEED_TIME, ACTION_DISTANCE, RUNNER_DEDUC, PULLER_DEDUC
+from simulation_common import cal_runner_time
+
+# General timeline for any number of actors. Every actor sits in a heap keyed by
+# (next action time, tie rank, push order). An actor's gauge (left_distance) is only
+# brought up to date when something touches it, and a changed actor is simply pushed
+# again with a new version; outdated heap entries are dropped when they surface. So an
+# action or an action advance costs O(log n), no matter how many actors there are.
+# Runner/Puller below reproduce the two-character model of full_simulation.py.
+#
+# Accepted divergence: full_simulation moves the puller's gauge at every runner action
+# and compares times relative to the current action, while here a gauge moves once, by
+# the time since it was last touched, and actors are ordered by absolute action time.
+# Both agree except where runner and puller tie exactly and float rounding decides the
+# order: in the single ultimate sweep that is puller 184 with runner 217, 226 and 258,
+# where max_turns_timeline gives 6 turns and max_turns 5 (see TIE_CELLS). Matching
+# them would mean touching every gauge at every action, O(n) per action
+TIE_CELLS = {(184, 217), (184, 226), (184, 258)}  # (puller speed, runner speed)
+
+URGENT_RANK = -1
+
+
+class Actor():
+    # plugin base: a character or enemy that only waits for its turn
+    rank = 2  # lower rank acts first on exact ties
+
+    def __init__(self, name, speed):
+        self.name = name
+        self.speed = speed
+        self.left_distance = ACTION_DISTANCE
+        self.updated = 0  # time at which left_distance was last valid
+        self.next_time = 0
+
+    def distance_at(self, now):
+        return self.left_distance - (now - self.updated) * self.speed
+
+    def time_to_act(self, now):
+        return self.left_distance / self.speed
+
+    def act(self, timeline):
+        self.left_distance = ACTION_DISTANCE
+
+
+class Runner(Actor):
+    rank = 0
+
+    def __init__(self, name, speed):
+        super().__init__(name, speed)
+        self.action_time = 0
+
+    def distance_at(self, now):
+        # the runner drops 60 speed once HIGH_SPEED_TIME has passed
+        if now <= HIGH_SPEED_TIME:
+            covered = self.speed * (now - self.updated)
+        elif self.updated >= HIGH_SPEED_TIME:
+            covered = (self.speed - 60) * (now - self.updated)
+        else:
+            covered = self.speed * (HIGH_SPEED_TIME - self.updated) + (self.speed - 60) * (now - HIGH_SPEED_TIME)
+        return self.left_distance - covered
+
+    def time_to_act(self, now):
+        return cal_runner_time(now, self.speed, self.left_distance, HIGH_SPEED_TIME)
+
+    def act(self, timeline):
+        self.action_time += 1
+        self.left_distance = ACTION_DISTANCE
+
+
+class Puller(Actor):
+    rank = 1
+
+    def __init__(self, name, speed, target, has_ultimate=True):
+        super().__init__(name, speed)
+        self.target = target
+        self.has_ultimate = has_ultimate
+
+    def act(self, timeline):
+        self.left_distance = ACTION_DISTANCE
+        timeline.set_distance(self.target, 0)
+
+    def ultimate(self, timeline):
+        # instant action: advances the target and the puller itself, and the puller
+        # wins a tie for the very next turn
+        self.has_ultimate = False
+        timeline.advance(self.target, RUNNER_DEDUC)
+        timeline.advance(self, PULLER_DEDUC, urgent=True)
+
+
+class Timeline():
+    def __init__(self, actors, total_time=TOTAL_TIME):
+        self.now = 0
+        self.turns = 0
+        self.total_time = total_time
+        self.heap = []
+        self.version = {}
+        self.urgent = []
+        self.counter = itertools.count()
+        for actor in actors:
+            self.version[actor] = 0
+            self.schedule(actor)
+
+    def schedule(self, actor, urgent=False):
+        actor.next_time = self.now + actor.time_to_act(self.now)
+        self.version[actor] += 1
+        rank = URGENT_RANK if urgent else actor.rank
+        heapq.heappush(self.heap, (actor.next_time, rank, next(self.counter), self.version[actor], actor))
+        if urgent:
+            self.urgent.append(actor)
+
+    def sync(self, actor):
+        actor.left_distance = actor.distance_at(self.now)
+        actor.updated = self.now
+
+    def set_distance(self, actor, left_distance, urgent=False):
+        self.sync(actor)
+        actor.left_distance = left_distance
+        self.schedule(actor, urgent)
+
+    def advance(self, actor, fraction, urgent=False):
+        self.sync(actor)
+        actor.left_distance = max(0, actor.left_distance - fraction * ACTION_DISTANCE)
+        self.schedule(actor, urgent)
+
+    def peek(self):
+        # drop entries of actors that were rescheduled since they were pushed
+        while self.heap[0][3] != self.version[self.heap[0][4]]:
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def step(self):
+        # next actor takes its turn; returns it, or None once past total_time
+        next_time, _, _, _, actor = self.peek()
+        if next_time > self.total_time:
+            return None
+        heapq.heappop(self.heap)
+        self.now = next_time
+        self.turns += 1
+        actor.updated = self.now
+        actor.act(self)
+        self.schedule(actor)
+
+        # urgency only decides the turn right after the instant action
+        urgent, self.urgent = self.urgent, []
+        for other in urgent:
+            if other is not actor:
+                self.sync(other)
+                self.schedule(other)
+        return actor
+
+    def run(self, policy=None):
+        # policy(timeline, node) may use instant abilities before every turn
+        node = 0
+        while True:
+            if policy is not None:
+                policy(self, node)
+            if self.step() is None:
+                return self
+            node += 1
+
+
+def timeline_turns(runner_speed, puller_speed, ult_node=None):
+    # runner turns when the puller's ultimate is used right before turn number ult_node
+    firefly = Runner("runner", runner_speed)
+    bronya = Puller("puller", puller_speed, target=firefly)
+
+    def policy(timeline, node):
+        if node == ult_node and bronya.has_ultimate:
+            bronya.ultimate(timeline)
+
+    Timeline([firefly, bronya]).run(policy)
+    return firefly.action_time
+
+
+def max_turns_timeline(runner_speed, puller_speed):
+    # max over every ultimate timing; the no-ultimate timeline tells how many turns
+    # (and so how many timings) there are
+    firefly = Runner("runner", runner_speed)
+    bronya = Puller("puller", puller_speed, target=firefly)
+    timeline = Timeline([firefly, bronya]).run()
+
+    best = firefly.action_time
+    for node in range(timeline.turns + 1):
+        best = max(best, timeline_turns(runner_speed, puller_speed, node))
+    return best
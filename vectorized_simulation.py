@@ -0,0 +1,113 @@
+import numpy as np
+
+from full_simulation import (TOTAL_TIME, HIGH_SPEED_TIME, ACTION_DISTANCE,
+                             RUNNER_DEDUC, PULLER_DEDUC)
+
+# With a single ultimate, a timeline is fully fixed once we know at which decision
+# node (0 = time 0, then one node per action) the ultimate is used, or that it never is.
+# So instead of recursing per cell, every (schedule, puller speed, runner speed) cell is
+# advanced in lock-step and the turns are maxed over the schedule axis.
+NEVER = -1
+
+
+def cal_runner_time(cur_time, speed, left_distance):
+    # array version of simulation_common.cal_runner_time, same float operations
+    runner_time_tmp = left_distance / speed
+    dis_after_high_speed = left_distance - speed * (HIGH_SPEED_TIME - cur_time)
+    crossed = dis_after_high_speed / (speed - 60) + HIGH_SPEED_TIME - cur_time
+    after = left_distance / (speed - 60)
+    return np.where(cur_time >= HIGH_SPEED_TIME, after,
+                    np.where(runner_time_tmp + cur_time > HIGH_SPEED_TIME, crossed, runner_time_tmp))
+
+
+def simulate_schedules(runner_speed, puller_speed, ult_node, runner_deduc=RUNNER_DEDUC, puller_deduc=PULLER_DEDUC):
+    # speeds, ult_node and the ultimate's deductions are broadcast against each other;
+    # returns (turns, number of decision nodes visited) per cell
+    runner_speed, puller_speed, ult_node, runner_deduc, puller_deduc = np.broadcast_arrays(
+        np.asarray(runner_speed, dtype=np.float64),
+        np.asarray(puller_speed, dtype=np.float64),
+        np.asarray(ult_node),
+        np.asarray(runner_deduc, dtype=np.float64),
+        np.asarray(puller_deduc, dtype=np.float64))
+    shape = runner_speed.shape
+
+    cur_time = np.zeros(shape)
+    runner_left = np.full(shape, float(ACTION_DISTANCE))
+    puller_left = np.full(shape, float(ACTION_DISTANCE))
+    has_ultimate = np.ones(shape, dtype=bool)
+    runs = np.zeros(shape, dtype=np.int64)
+    nodes = np.zeros(shape, dtype=np.int64)
+    active = np.ones(shape, dtype=bool)
+
+    node = 0
+    while active.any():
+        nodes += active
+        use_ultimate = active & has_ultimate & (ult_node == node)
+        runner_left = np.where(use_ultimate, np.maximum(0, runner_left - runner_deduc * ACTION_DISTANCE), runner_left)
+        puller_left = np.where(use_ultimate, np.maximum(0, puller_left - puller_deduc * ACTION_DISTANCE), puller_left)
+        has_ultimate &= ~use_ultimate
+
+        runner_time = cal_runner_time(cur_time, runner_speed, runner_left)
+        puller_time = puller_left / puller_speed
+
+        # explicit tie-break (puller first only if used ultimate), as in simulate
+        runner_acts = (runner_time < puller_time) | ((runner_time == puller_time) & ~use_ultimate)
+        next_time = cur_time + np.where(runner_acts, runner_time, puller_time)
+        active &= next_time <= TOTAL_TIME
+
+        runs += active & runner_acts
+        puller_left = np.where(active, np.where(runner_acts, puller_left - runner_time * puller_speed, ACTION_DISTANCE),
+                               puller_left)
+        runner_left = np.where(active, np.where(runner_acts, ACTION_DISTANCE, 0), runner_left)
+        cur_time = np.where(active, next_time, cur_time)
+        node += 1
+    return runs, nodes
+
+
+def max_turns_vectorized(runner_speed, puller_speed, runner_deduc=RUNNER_DEDUC, puller_deduc=PULLER_DEDUC,
+                         schedule_batch=8):
+    # max_turns for every cell of the broadcast inputs; schedule_batch bounds how many
+    # schedules are stacked in memory at once
+    runner_speed, puller_speed, runner_deduc, puller_deduc = np.broadcast_arrays(
+        np.asarray(runner_speed, dtype=np.float64), np.asarray(puller_speed, dtype=np.float64),
+        np.asarray(runner_deduc, dtype=np.float64), np.asarray(puller_deduc, dtype=np.float64))
+    turns, never_nodes = simulate_schedules(runner_speed, puller_speed, NEVER, runner_deduc, puller_deduc)
+
+    # a schedule only differs from "never" if its node is reached on the never timeline
+    num_schedules = never_nodes.max()
+    extra_axes = (1,) * runner_speed.ndim
+    for start in range(0, num_schedules, schedule_batch):
+        schedules = np.arange(start, min(start + schedule_batch, num_schedules)).reshape((-1,) + extra_axes)
+        runs, _ = simulate_schedules(runner_speed, puller_speed, schedules, runner_deduc, puller_deduc)
+        turns = np.maximum(turns, runs.max(axis=0))
+    return turns
+
+
+def round_table_vectorized(puller_speeds, runner_speeds, schedule_batch=8):
+    # round_table[i][j] == max_turns(runner_speeds[j], puller_speeds[i])
+    puller_grid, runner_grid = np.meshgrid(np.asarray(puller_speeds, dtype=np.float64),
+                                           np.asarray(runner_speeds, dtype=np.float64), indexing="ij")
+    return max_turns_vectorized(runner_grid, puller_grid, schedule_batch=schedule_batch).astype(np.float64)
+
+
+if __name__ == "__main__":
+    # dataframes are only needed to write the CSV, importing the engine stays light
+    import pandas as pd
+
+    min_puller_speed = 99 + 10
+    max_puller_speed = 185 + 10
+
+    min_runner_speed = 169 + 11
+    max_runner_speed = 255 + 11
+
+    runner_speeds = np.arange(min_runner_speed, max_runner_speed + 1)
+    puller_speeds = np.arange(min_puller_speed, max_puller_speed + 1)
+    round_table = round_table_vectorized(puller_speeds, runner_speeds)
+
+    df = pd.DataFrame(round_table, index=puller_speeds, columns=runner_speeds)
+    df.index.name = 'Puller_speed'
+    df.columns.name = 'Runner_speed'
+
+    csv_filename = "round_table_with_full_time_other.csv"
+    df.to_csv(csv_filename)
+    print(f"Round table saved to {csv_filename}")